@@ -0,0 +1,186 @@
+from __future__ import print_function
+import sys
+import threading
+from chessgame import ChessBoard, ChessComputer, Side
+
+# A long-running engine process that reads commands from stdin, one per
+# line, and writes its answers to stdout, in the style of the UCI protocol.
+# The transposition table, killer moves and history of ChessComputer stay
+# filled between commands (older entries are aged out, see
+# ChessComputer.new_search), so a resident engine keeps its tables warm.
+#
+# Supported commands:
+#   uci                                 -> id lines and uciok
+#   isready                             -> readyok
+#   ucinewgame                          clears the hash tables
+#   position file <name> [moves ...]    loads a .chb file
+#   position fen <pieces> <w|b> [moves ...]
+#                                       loads the piece placement of a FEN
+#                                       string (pieces r, k, p, q and b)
+#   go [depth <plies>] [movetime <ms>] [infinite]
+#                                       searches the current position and
+#                                       answers with info lines and bestmove
+#   stop                                stops the running search
+#   d                                   prints the current board
+#   quit                                stops the engine
+class ChessEngine:
+    # Depth used when go gives no depth, e.g. for "go movetime 1000"
+    MAX_DEPTH = 64
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.chessboard = None
+        self.search_thread = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    # Reads and handles commands until quit is received or the input ends
+    def run(self, input_stream=sys.stdin):
+        while True:
+            line = input_stream.readline()
+            if not line or not self.handle(line):
+                break
+        self.stop()
+
+    # Handles one command line. Returns False when the engine should quit.
+    def handle(self, line):
+        words = line.split()
+        if not words:
+            return True
+        command = words[0]
+        if command == "uci":
+            self.send("id name ZoekStuurBeweeg")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            ChessComputer.transposition_table.clear()
+            ChessComputer.killer_moves.clear()
+            ChessComputer.history.clear()
+        elif command == "position":
+            self.stop()
+            self.set_position(words[1:])
+        elif command == "go":
+            self.stop()
+            self.go(words[1:])
+        elif command == "stop":
+            self.stop()
+        elif command == "d":
+            if self.chessboard != None:
+                self.send(str(self.chessboard).rstrip("\n"))
+        elif command == "quit":
+            return False
+        else:
+            self.send("info string unknown command " + command)
+        return True
+
+    def set_position(self, words):
+        if "moves" in words:
+            moves = words[words.index("moves") + 1:]
+            words = words[:words.index("moves")]
+        else:
+            moves = []
+        try:
+            if words[0] == "file":
+                with open(words[1]) as f:
+                    content = f.read()
+            elif words[0] == "fen":
+                content = fen_to_input(words[1], words[2])
+            else:
+                raise ValueError("unknown position type " + words[0])
+        except (IndexError, IOError, ValueError) as e:
+            self.send("info string invalid position: " + str(e))
+            return
+        chessboard = ChessBoard(Side.White)
+        chessboard.load_from_input(content)
+        for move in moves:
+            if not chessboard.is_valid_move(move):
+                self.send("info string illegal move " + move)
+                return
+            chessboard = chessboard.make_move(move)
+        self.chessboard = chessboard
+
+    # Starts the search in a separate thread, so stop can still be read
+    def go(self, words):
+        if self.chessboard == None:
+            self.send("info string no position")
+            return
+        depth = self.MAX_DEPTH
+        movetime = None
+        try:
+            if "depth" in words:
+                depth = int(words[words.index("depth") + 1])
+            if "movetime" in words:
+                movetime = int(words[words.index("movetime") + 1]) / 1000.0
+        except (IndexError, ValueError) as e:
+            self.send("info string invalid go command: " + str(e))
+            return
+        self.search_thread = threading.Thread(
+            target=self.search, args=(self.chessboard, depth, movetime))
+        self.search_thread.start()
+
+    def search(self, chessboard, depth, movetime):
+        possible_moves = chessboard.legal_moves()
+        if not possible_moves:
+            self.send("bestmove 0000")
+            return
+        result = ChessComputer.iterative_deepening(chessboard, depth,
+                                                   movetime, self.info,
+                                                   quiescence=True)
+        if result == None:
+            entry = ChessComputer.transposition_table.get(
+                chessboard.hash_key())
+            if entry != None and entry[0] in possible_moves:
+                best_move = entry[0]
+            else:
+                best_move = possible_moves[0]
+        else:
+            best_move = result[1]
+        self.send("bestmove " + best_move)
+
+    # The principal variation of the search that just completed is reported,
+    # it starts with the best move
+    def info(self, depth, score, move, nodes, elapsed):
+        nps = int(nodes / elapsed) if elapsed > 0 else nodes
+        pv = ChessComputer.principal_variation or [move]
+        self.send("info depth %d score cp %d nodes %d nps %d time %d pv %s" %
+                  (depth, score, nodes, nps, int(elapsed * 1000), " ".join(pv)))
+
+    # Stops the running search, which still sends its bestmove
+    def stop(self):
+        if self.search_thread != None:
+            ChessComputer.stop_requested = True
+            self.search_thread.join()
+            ChessComputer.stop_requested = False
+            self.search_thread = None
+
+# Converts the piece placement and side to move of a FEN string to the
+# input format of ChessBoard.load_from_input
+def fen_to_input(placement, side):
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise ValueError("expected 8 rows in " + placement)
+    lines = []
+    for row in rows:
+        line = ""
+        for char in row:
+            if char.isdigit():
+                line += "." * int(char)
+            elif char.lower() in "rkpqb":
+                line += char
+            else:
+                raise ValueError("unsupported piece " + char)
+        if len(line) != 8:
+            raise ValueError("expected 8 fields in " + row)
+        lines.append(line)
+    if side.lower() not in ("w", "b"):
+        raise ValueError("unknown side to move " + side)
+    return "\n".join(lines) + "\n" + side.upper()
+
+if __name__ == "__main__":
+    ChessEngine().run()
@@ -1,6 +1,7 @@
 from __future__ import print_function
 from copy import deepcopy
 import sys
+import time
 import numpy as np
 
 ## Helper functions
@@ -182,6 +183,133 @@ class ChessBoard:
                             move_list.append(move)
         return move_list
 
+    # Returns a string that identifies this board configuration together with
+    # whose turn it is. Used as the key of the transposition table.
+    def hash_key(self):
+        key = [str(self.turn)]
+        for board_row in self.board_matrix:
+            for piece in board_row:
+                if piece == None:
+                    key.append('.')
+                elif piece.side == Side.White:
+                    key.append(piece.material.upper())
+                else:
+                    key.append(piece.material)
+        return ''.join(key)
+
+    # Generates the same moves as legal_moves, but lazily and in stages:
+    # first the hash move, then the captures, then the killer moves and
+    # finally the quiet moves. A stage is only generated once the search
+    # asks for a move after the previous stage, so a search that cuts off
+    # on an early move never generates the remaining moves.
+    # If an exchange function is given (see ChessComputer.static_exchange),
+    # the captures are ordered by the material they win and the losing
+    # captures are postponed until after the quiet moves. If a history
+    # table is given (a dictionary from move to score), the quiet moves are
+    # ordered by their history score.
+    def generate_moves(self, hash_move=None, killers=(), exchange=None,
+                       history=None):
+        done = []
+        if hash_move != None and self.is_valid_move(hash_move):
+            done.append(hash_move)
+            yield hash_move
+
+        own = []
+        enemy = []
+        empty = []
+        for x in range(8):
+            for y in range(8):
+                piece = self.get_boardpiece((x,y))
+                if piece == None:
+                    empty.append((x,y))
+                elif piece.side == self.turn:
+                    own.append((x,y))
+                else:
+                    enemy.append((x,y))
+
+        # Captures
+        losing_captures = []
+        if exchange == None:
+            for start in own:
+                for end in enemy:
+                    move = to_move(start, end)
+                    if move not in done and self.is_legal_move(move):
+                        yield move
+        else:
+            captures = []
+            for start in own:
+                for end in enemy:
+                    move = to_move(start, end)
+                    if move not in done and self.is_legal_move(move):
+                        captures.append((exchange(self, move), move))
+            captures.sort(key=lambda capture: -capture[0])
+            for (gain, move) in captures:
+                if gain < 0:
+                    losing_captures.append(move)
+                else:
+                    yield move
+
+        # Killer moves, only when they are quiet moves in this position
+        for move in killers:
+            if move in done or not self.is_valid_move(move):
+                continue
+            if self.get_boardpiece(to_coordinate(move[2:])) == None:
+                done.append(move)
+                yield move
+
+        # Quiet moves
+        if history == None:
+            for start in own:
+                for end in empty:
+                    move = to_move(start, end)
+                    if move not in done and self.is_legal_move(move):
+                        yield move
+        else:
+            quiet_moves = []
+            for start in own:
+                for end in empty:
+                    move = to_move(start, end)
+                    if move not in done and self.is_legal_move(move):
+                        quiet_moves.append(move)
+            quiet_moves.sort(key=lambda move: -history.get(move, 0))
+            for move in quiet_moves:
+                yield move
+
+        # Captures that lose material according to the exchange function
+        for move in losing_captures:
+            yield move
+
+    # Returns the positions of all pieces of the given side that can move to
+    # (and thus capture on) the given position
+    def attackers(self, position, side):
+        board = self
+        if self.turn != side:
+            board = ChessBoard(side)
+            board.set_board_matrix(self.board_matrix)
+        attacker_list = []
+        for x in range(8):
+            for y in range(8):
+                piece = self.get_boardpiece((x,y))
+                if piece == None or piece.side != side or (x,y) == position:
+                    continue
+                if board.is_legal_move(to_move((x,y), position)):
+                    attacker_list.append((x,y))
+        return attacker_list
+
+    # Like is_legal_move, but also checks that the start position holds a
+    # piece of the side to move. Used for moves that were not generated
+    # from this board, such as hash moves and killer moves.
+    def is_valid_move(self, move):
+        # Moves that are not written like a2a3 are never valid
+        if len(move) != 4 or move[0] not in "abcdefgh" or \
+                move[2] not in "abcdefgh" or move[1] not in "12345678" or \
+                move[3] not in "12345678":
+            return False
+        piece = self.get_boardpiece(to_coordinate(move[:2]))
+        if piece == None or piece.side != self.turn:
+            return False
+        return self.is_legal_move(move)
+
     # Generates all possible moves from a start coordinate, without taking
     # the rules of the game into account
     def all_moves(self, coordinates):
@@ -396,29 +524,74 @@ class ChessBoard:
                     return True
         return False
 
+# Raised inside the search when it has to stop, because its time is up or
+# because a stop was requested
+class SearchStopped(Exception):
+    pass
+
 # This static class is responsible for providing functions that can calculate
 # the optimal move using minimax
 class ChessComputer:
 
+    # Results of the searched positions, keyed by ChessBoard.hash_key. Each
+    # entry is a tuple (best move, depth, flag, score, age), where flag tells
+    # whether the score is exact or a bound. The best move is tried first
+    # when the position is searched again, and the score is reused when it
+    # was searched to the same depth. The table is kept between searches:
+    # every search gets a new age, and when the table is full the entries
+    # of older searches are removed first.
+    transposition_table = {}
+    EXACT, LOWER_BOUND, UPPER_BOUND = range(0, 3)
+    search_age = 0
+    max_table_size = 500000
+
+    # Number of cutoffs caused by each quiet move, weighted by depth. Used
+    # to order the quiet moves, and halved at the start of every search.
+    history = {}
+
+    # The expected line of play found by the last search
+    principal_variation = []
+
+    # Quiet moves that caused a cutoff, stored per depth. They are tried
+    # right after the captures in sibling positions.
+    killer_moves = {}
+
+    # Whether the scores in the transposition table were computed with the
+    # quiescence search at the leaves
+    table_quiescence = False
+
+    # Search statistics and control: the number of nodes searched, the time
+    # at which the search has to stop and whether a stop was requested
+    nodes = 0
+    deadline = None
+    stop_requested = False
+
     # This method uses either alphabeta or minimax to calculate the best move
     # possible. The input needed is a chessboard configuration and the max
     # depth of the search algorithm. It returns a tuple of (score, chessboard)
     # with score the maximum score attainable and chessboardmove that is needed
     # to achieve this score.
+    # If quiescence is True, the leaves of the search are extended with a
+    # search over the captures that do not lose material.
     @staticmethod
-    def computer_move(chessboard, depth, alphabeta=False):
+    def computer_move(chessboard, depth, alphabeta=False, quiescence=False):
+        if quiescence != ChessComputer.table_quiescence:
+            # The stored scores were computed with the other leaf scoring
+            ChessComputer.transposition_table.clear()
+            ChessComputer.table_quiescence = quiescence
         if alphabeta:
             inf = 99999999
             min_inf = -inf
-            return ChessComputer.alphabeta(chessboard, depth, min_inf, inf)
+            return ChessComputer.alphabeta(chessboard, depth, min_inf, inf,
+                                           quiescence)
         else:
-            return ChessComputer.minimax(chessboard, depth)
+            return ChessComputer.minimax(chessboard, depth, quiescence)
 
     # This function uses minimax to calculate the next move. Given the current
     # chessboard and max depth, this function returns a tuple of the
     # the score and the move that should be executed
     @staticmethod
-    def minimax(chessboard, depth):
+    def minimax(chessboard, depth, quiescence=False):
         depth += 1
         possible_moves = ChessBoard.legal_moves(chessboard)
         best_move = possible_moves[0]
@@ -429,12 +602,12 @@ class ChessComputer:
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
             if chessboard.turn == Side.Black:
-                score = ChessComputer.max_value(new_board, depth)
+                score = ChessComputer.max_value(new_board, depth, quiescence)
                 if score < best_score:
                     best_move = move
                     best_score = score
             else:
-                score = ChessComputer.min_value(new_board, depth)
+                score = ChessComputer.min_value(new_board, depth, quiescence)
                 if score > best_score:
                     best_move = move
                     best_score = score
@@ -442,99 +615,356 @@ class ChessComputer:
 
     # Help function of the minimax algorithm
     @staticmethod
-    def min_value(chessboard, depth):
+    def min_value(chessboard, depth, quiescence=False):
         depth -= 1
         if ChessBoard.is_king_dead(chessboard, chessboard.turn):
             return ChessComputer.evaluate_board(chessboard, depth)
         possible_moves = ChessBoard.legal_moves(chessboard)
         if depth == 1:
-            scores = ChessComputer.scores(chessboard, possible_moves, depth)
+            scores = ChessComputer.scores(chessboard, possible_moves, depth,
+                                          quiescence)
             return min(scores)
         best = 9999999
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
-            value = ChessComputer.max_value(new_board, depth)
+            value = ChessComputer.max_value(new_board, depth, quiescence)
             if value < best:
                 best = value
         return best
 
     # Help function of the minimax algorithm
     @staticmethod
-    def max_value(chessboard, depth):
+    def max_value(chessboard, depth, quiescence=False):
         depth -= 1
         if ChessBoard.is_king_dead(chessboard, chessboard.turn):
             return ChessComputer.evaluate_board(chessboard, depth)
         possible_moves = ChessBoard.legal_moves(chessboard)
         if depth == 1:
-            scores = ChessComputer.scores(chessboard, possible_moves, depth)
+            scores = ChessComputer.scores(chessboard, possible_moves, depth,
+                                          quiescence)
             return min(scores)
         best = -9999999
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
-            value = ChessComputer.min_value(new_board, depth)
+            value = ChessComputer.min_value(new_board, depth, quiescence)
             if value > best:
                 best = value
         return best
 
     # The alpha beta version of min_value
     @staticmethod
-    def min_value_ab(chessboard, depth, alpha, beta):
+    def min_value_ab(chessboard, depth, alpha, beta, quiescence=False):
+        ChessComputer.count_node()
         depth -= 1
         if ChessBoard.is_king_dead(chessboard, chessboard.turn):
             return ChessComputer.evaluate_board(chessboard, depth)
-        possible_moves = ChessBoard.legal_moves(chessboard)
         if depth == 1:
-            scores = ChessComputer.scores(chessboard, possible_moves, depth)
+            possible_moves = ChessBoard.legal_moves(chessboard)
+            scores = ChessComputer.scores(chessboard, possible_moves, depth,
+                                          quiescence)
             return min(scores)
+        key = chessboard.hash_key()
+        entry = ChessComputer.transposition_table.get(key)
+        hash_move = None
+        if entry != None:
+            hash_move = entry[0]
+            if ChessComputer.table_cutoff(entry, depth, alpha, beta):
+                return entry[3]
+        possible_moves = chessboard.generate_moves(
+            hash_move, ChessComputer.killer_moves.get(depth, ()),
+            ChessComputer.static_exchange, ChessComputer.history)
+        beta_start = beta
         best = 9999999
+        best_move = None
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
-            value = ChessComputer.max_value_ab(new_board, depth, alpha, beta)
+            value = ChessComputer.max_value_ab(new_board, depth, alpha, beta,
+                                               quiescence)
             if value < best:
                 best = value
+                best_move = move
             if value <= alpha:
+                ChessComputer.store_cutoff(chessboard, key, move, depth)
+                ChessComputer.store(key, move, depth,
+                                    ChessComputer.UPPER_BOUND, value)
                 return value
             beta = min([beta, value])
+        if best_move != None:
+            if best >= beta_start:
+                flag = ChessComputer.LOWER_BOUND
+            else:
+                flag = ChessComputer.EXACT
+            ChessComputer.store(key, best_move, depth, flag, best)
         return best
 
     # The alpha beta version of max_value
     @staticmethod
-    def max_value_ab(chessboard, depth, alpha, beta):
+    def max_value_ab(chessboard, depth, alpha, beta, quiescence=False):
+        ChessComputer.count_node()
         depth -= 1
         if ChessBoard.is_king_dead(chessboard, chessboard.turn):
             return ChessComputer.evaluate_board(chessboard, depth)
-        possible_moves = ChessBoard.legal_moves(chessboard)
         if depth == 1:
-            scores = ChessComputer.scores(chessboard, possible_moves, depth)
+            possible_moves = ChessBoard.legal_moves(chessboard)
+            scores = ChessComputer.scores(chessboard, possible_moves, depth,
+                                          quiescence)
             return min(scores)
+        key = chessboard.hash_key()
+        entry = ChessComputer.transposition_table.get(key)
+        hash_move = None
+        if entry != None:
+            hash_move = entry[0]
+            if ChessComputer.table_cutoff(entry, depth, alpha, beta):
+                return entry[3]
+        possible_moves = chessboard.generate_moves(
+            hash_move, ChessComputer.killer_moves.get(depth, ()),
+            ChessComputer.static_exchange, ChessComputer.history)
+        alpha_start = alpha
         best = -9999999
+        best_move = None
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
-            value = ChessComputer.min_value_ab(new_board, depth, alpha, beta)
+            value = ChessComputer.min_value_ab(new_board, depth, alpha, beta,
+                                               quiescence)
             if value > best:
                 best = value
+                best_move = move
             if value >= beta:
+                ChessComputer.store_cutoff(chessboard, key, move, depth)
+                ChessComputer.store(key, move, depth,
+                                    ChessComputer.LOWER_BOUND, value)
                 return value
             alpha = max([alpha, value])
+        if best_move != None:
+            if best <= alpha_start:
+                flag = ChessComputer.UPPER_BOUND
+            else:
+                flag = ChessComputer.EXACT
+            ChessComputer.store(key, best_move, depth, flag, best)
         return best
 
+    # Counts a searched node and stops the search when needed. The clock is
+    # only read every 64 nodes.
+    @staticmethod
+    def count_node():
+        ChessComputer.nodes += 1
+        if ChessComputer.stop_requested:
+            raise SearchStopped()
+        if ChessComputer.deadline != None and ChessComputer.nodes % 64 == 0 \
+                and time.time() > ChessComputer.deadline:
+            raise SearchStopped()
+
+    # Searches with alphabeta to depth 1, 2, ... up to max_depth, until the
+    # movetime (in seconds) is up or a stop is requested. After every
+    # completed depth, info is called (when given) with the depth, score,
+    # best move, number of nodes and elapsed time. Returns the (score, move)
+    # tuple of the deepest completed search, or None if not even the search
+    # to depth 1 completed. quiescence is passed on to computer_move.
+    @staticmethod
+    def iterative_deepening(chessboard, max_depth, movetime=None, info=None,
+                            quiescence=False):
+        start = time.time()
+        ChessComputer.new_search()
+        ChessComputer.nodes = 0
+        if movetime != None:
+            ChessComputer.deadline = start + movetime
+        result = None
+        try:
+            for depth in range(1, max_depth + 1):
+                score, move = ChessComputer.computer_move(
+                    chessboard, depth, alphabeta=True, quiescence=quiescence)
+                result = (score, move)
+                if info != None:
+                    info(depth, score, move, ChessComputer.nodes,
+                         time.time() - start)
+        except SearchStopped:
+            pass
+        finally:
+            ChessComputer.deadline = None
+            ChessComputer.stop_requested = False
+        return result
+
+    # Remembers a quiet move that caused a cutoff: as killer move for its
+    # depth and in the history table. At most two killer moves are kept per
+    # depth, the most recent one first.
+    @staticmethod
+    def store_cutoff(chessboard, key, move, depth):
+        if chessboard.get_boardpiece(to_coordinate(move[2:])) != None:
+            return
+        history = ChessComputer.history
+        history[move] = history.get(move, 0) + depth * depth
+        killers = ChessComputer.killer_moves.get(depth, [])
+        if move not in killers:
+            ChessComputer.killer_moves[depth] = [move] + killers[:1]
+
+    # Stores a search result in the transposition table. An entry of the
+    # current search is only replaced by a result of at least the same
+    # depth, entries of older searches are always replaced.
+    @staticmethod
+    def store(key, move, depth, flag, score):
+        table = ChessComputer.transposition_table
+        entry = table.get(key)
+        if entry == None or entry[4] != ChessComputer.search_age or \
+                entry[1] <= depth:
+            table[key] = (move, depth, flag, score, ChessComputer.search_age)
+
+    # Whether a stored entry decides the score of a position searched to the
+    # given depth within the (alpha, beta) window. Scores depend on the depth
+    # (see get_weight), so only entries of exactly that depth are used.
+    @staticmethod
+    def table_cutoff(entry, depth, alpha, beta):
+        (move, entry_depth, flag, score, age) = entry
+        if entry_depth != depth:
+            return False
+        if flag == ChessComputer.EXACT:
+            return True
+        if flag == ChessComputer.LOWER_BOUND:
+            return score >= beta
+        return score <= alpha
+
+    # Prepares the tables for a new search without clearing them: the
+    # search age is increased, the history scores are halved and, if the
+    # transposition table is full, the entries of older searches are
+    # removed, the oldest first.
+    @staticmethod
+    def new_search():
+        ChessComputer.search_age += 1
+        history = ChessComputer.history
+        for move in list(history):
+            history[move] //= 2
+            if history[move] == 0:
+                del history[move]
+        table = ChessComputer.transposition_table
+        age = ChessComputer.search_age - 8
+        while len(table) > ChessComputer.max_table_size and \
+                age < ChessComputer.search_age:
+            for key in [key for key in table if table[key][4] <= age]:
+                del table[key]
+            age += 1
+
+    # Follows the best moves in the transposition table from the given
+    # board, giving the line of play the search expects
+    @staticmethod
+    def find_principal_variation(chessboard, max_length):
+        line = []
+        seen = set()
+        while len(line) < max_length:
+            key = chessboard.hash_key()
+            entry = ChessComputer.transposition_table.get(key)
+            if entry == None or key in seen or \
+                    not chessboard.is_valid_move(entry[0]):
+                break
+            seen.add(key)
+            line.append(entry[0])
+            chessboard = chessboard.make_move(entry[0])
+        return line
+
     # Calculates the score of a board after a move, for all possible moves.
     @staticmethod
-    def scores(chessboard, possible_moves, depth):
+    def scores(chessboard, possible_moves, depth, quiescence=False):
         scores = []
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
-            scores.append(ChessComputer.evaluate_board(new_board, depth))
+            if quiescence:
+                scores.append(ChessComputer.quiescence(new_board, depth,
+                                                       -9999999, 9999999))
+            else:
+                scores.append(ChessComputer.evaluate_board(new_board, depth))
         return scores
 
+    # Searches only the captures that do not lose material according to the
+    # static exchange evaluation, so the leaves of the search are not scored
+    # in the middle of an exchange. The side to move may always stop
+    # capturing and keep the current score.
+    @staticmethod
+    def quiescence(chessboard, depth, alpha, beta):
+        stand_pat = ChessComputer.evaluate_board(chessboard, depth)
+        if ChessBoard.is_king_dead(chessboard, chessboard.turn):
+            return stand_pat
+        captures = ChessComputer.winning_captures(chessboard)
+        best = stand_pat
+        if chessboard.turn == Side.White:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max([alpha, stand_pat])
+            for move in captures:
+                new_board = ChessBoard.make_move(chessboard, move)
+                value = ChessComputer.quiescence(new_board, depth, alpha, beta)
+                if value > best:
+                    best = value
+                if value >= beta:
+                    return value
+                alpha = max([alpha, value])
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min([beta, stand_pat])
+            for move in captures:
+                new_board = ChessBoard.make_move(chessboard, move)
+                value = ChessComputer.quiescence(new_board, depth, alpha, beta)
+                if value < best:
+                    best = value
+                if value <= alpha:
+                    return value
+                beta = min([beta, value])
+        return best
+
+    # Returns the captures of the side to move that do not lose material,
+    # the most profitable capture first
+    @staticmethod
+    def winning_captures(chessboard):
+        captures = []
+        for x in range(8):
+            for y in range(8):
+                piece = chessboard.get_boardpiece((x,y))
+                if piece == None or piece.side == chessboard.turn:
+                    continue
+                for start in chessboard.attackers((x,y), chessboard.turn):
+                    move = to_move(start, (x,y))
+                    gain = ChessComputer.static_exchange(chessboard, move)
+                    if gain >= 0:
+                        captures.append((gain, move))
+        captures.sort(key=lambda capture: -capture[0])
+        return [move for (gain, move) in captures]
+
+    # Static exchange evaluation: returns the material the side to move wins
+    # with the given move when both sides keep recapturing on the target
+    # square with their least valuable piece, each side being free to stop
+    # recapturing when that is better. Quiet moves have a value of 0.
+    @staticmethod
+    def static_exchange(chessboard, move):
+        end = to_coordinate(move[2:])
+        captured = chessboard.get_boardpiece(end)
+        if captured == None:
+            return 0
+        gain = ChessComputer.get_score(captured.material)
+        if captured.material == Material.King:
+            return gain
+        new_board = ChessBoard.make_move(chessboard, move)
+        attackers = new_board.attackers(end, new_board.turn)
+        if not attackers:
+            return gain
+        start = min(attackers, key=lambda position: ChessComputer.get_score(
+            new_board.get_boardpiece(position).material))
+        recapture = ChessComputer.static_exchange(new_board,
+                                                  to_move(start, end))
+        return gain - max([0, recapture])
+
     # This function uses alphabeta to calculate the next move. Given the
     # chessboard and max depth, this function should return a tuple of the
     # the score and the move that should be executed.
     # It has alpha and beta as extra pruning parameters
+    # The best move of the previous search of this position is searched
+    # first, and the best score so far bounds the search of the other moves.
     @staticmethod
-    def alphabeta(chessboard, depth, alpha, beta):
+    def alphabeta(chessboard, depth, alpha, beta, quiescence=False):
         depth += 1
         possible_moves = ChessBoard.legal_moves(chessboard)
+        key = chessboard.hash_key()
+        entry = ChessComputer.transposition_table.get(key)
+        if entry != None and entry[0] in possible_moves:
+            possible_moves.remove(entry[0])
+            possible_moves.insert(0, entry[0])
         best_move = possible_moves[0]
         if chessboard.turn == Side.Black:
             best_score = 9999999
@@ -545,15 +975,23 @@ class ChessComputer:
         for move in possible_moves:
             new_board = ChessBoard.make_move(chessboard, move)
             if chessboard.turn == Side.Black:
-                score = ChessComputer.max_value_ab(new_board, depth, alpha, beta)
+                score = ChessComputer.max_value_ab(new_board, depth, alpha, beta,
+                                                   quiescence)
                 if score < best_score:
                     best_move = move
                     best_score = score
+                    beta = best_score
             else:
-                score = ChessComputer.min_value_ab(new_board, depth, alpha, beta)
+                score = ChessComputer.min_value_ab(new_board, depth, alpha, beta,
+                                                   quiescence)
                 if score > best_score:
                     best_move = move
                     best_score = score
+                    alpha = best_score
+        ChessComputer.store(key, best_move, depth, ChessComputer.EXACT,
+                            best_score)
+        ChessComputer.principal_variation = \
+            ChessComputer.find_principal_variation(chessboard, depth)
         return best_score, best_move
 
     # Calculates the score of a given board configuration based on the
@@ -600,6 +1038,153 @@ class ChessComputer:
             score += 150
         return score
 
+    # Solves mate problems: returns the shortest list of moves with which
+    # the side to move forces the capture of the enemy king within n moves
+    # of its own (the capture itself not included), or None when no such
+    # mate exists. Uses proof-number search, once for every mate length
+    # from 1 up to n, so the first proof found is also the shortest mate
+    # and no line longer than that is ever searched.
+    @staticmethod
+    def solve_mate(chessboard, n):
+        for length in range(1, n + 1):
+            root = ProofNode(chessboard, None, None, length + 1)
+            ProofNode.search(root)
+            if root.proof == 0:
+                return root.principal_variation()
+        return None
+
+
+# A node in the proof-number search tree of ChessComputer.solve_mate. In OR
+# nodes the attacking side is to move, in AND nodes the defending side.
+# moves_left is the number of moves the attacker may still make, including
+# the capture of the king.
+class ProofNode:
+    INFINITY = 99999999
+
+    def __init__(self, chessboard, move, parent, moves_left):
+        self.chessboard = chessboard
+        self.move = move
+        self.parent = parent
+        self.moves_left = moves_left
+        self.children = []
+        self.expanded = False
+        if parent == None:
+            self.is_or_node = True
+            self.attacker = chessboard.turn
+        else:
+            self.is_or_node = not parent.is_or_node
+            self.attacker = parent.attacker
+        self.proof = 1
+        self.disproof = 1
+        self.evaluate()
+
+    # Sets the proof and disproof numbers of terminal nodes. An OR node is
+    # proven when the attacker can capture the king, and disproven when the
+    # attacker lost its own king or has no moves left.
+    def evaluate(self):
+        if not self.is_or_node:
+            return
+        if self.chessboard.is_king_dead(self.attacker):
+            self.set_disproven()
+        elif self.can_capture_king():
+            self.set_proven()
+        elif self.moves_left <= 1:
+            self.set_disproven()
+
+    def can_capture_king(self):
+        for x in range(8):
+            for y in range(8):
+                piece = self.chessboard.get_boardpiece((x,y))
+                if piece != None and piece.side != self.attacker and \
+                        piece.material == Material.King:
+                    return len(self.chessboard.attackers((x,y),
+                                                         self.attacker)) > 0
+        return False
+
+    def set_proven(self):
+        self.proof = 0
+        self.disproof = ProofNode.INFINITY
+
+    def set_disproven(self):
+        self.proof = ProofNode.INFINITY
+        self.disproof = 0
+
+    def is_solved(self):
+        return self.proof == 0 or self.disproof == 0
+
+    def expand(self):
+        self.expanded = True
+        if self.is_or_node:
+            moves_left = self.moves_left - 1
+        else:
+            moves_left = self.moves_left
+        for move in self.chessboard.legal_moves():
+            new_board = self.chessboard.make_move(move)
+            self.children.append(ProofNode(new_board, move, self, moves_left))
+        self.update()
+
+    # Recomputes the proof and disproof numbers from the children
+    def update(self):
+        if not self.children:
+            # The defender has no moves left, which is not a mate
+            self.set_disproven()
+        elif self.is_or_node:
+            self.proof = min([child.proof for child in self.children])
+            self.disproof = min([ProofNode.INFINITY, sum(
+                [child.disproof for child in self.children])])
+        else:
+            self.proof = min([ProofNode.INFINITY, sum(
+                [child.proof for child in self.children])])
+            self.disproof = min([child.disproof for child in self.children])
+
+    # Follows the children that determine the proof or disproof number of
+    # their parent down to the most-proving leaf
+    def most_proving(self):
+        node = self
+        while node.expanded:
+            if node.is_or_node:
+                node = min(node.children, key=lambda child: child.proof)
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+        return node
+
+    # Expands most-proving nodes until the root is proven or disproven
+    @staticmethod
+    def search(root):
+        while not root.is_solved():
+            node = root.most_proving()
+            node.expand()
+            node = node.parent
+            while node != None:
+                node.update()
+                node = node.parent
+
+    # The number of attacker moves in the longest forced line of a proven
+    # node, assuming the defender resists as long as possible
+    def mate_distance(self):
+        if not self.expanded:
+            return 0
+        distances = [child.mate_distance() + (1 if self.is_or_node else 0)
+                     for child in self.children if child.proof == 0]
+        if self.is_or_node:
+            return min(distances)
+        return max(distances)
+
+    # The moves of the shortest mate of a proven node, with the defender
+    # choosing the replies that delay the mate the longest
+    def principal_variation(self):
+        node = self
+        line = []
+        while node.expanded:
+            proven = [child for child in node.children if child.proof == 0]
+            if node.is_or_node:
+                node = min(proven, key=lambda child: child.mate_distance())
+            else:
+                node = max(proven, key=lambda child: child.mate_distance())
+            line.append(node.move)
+        return line
+
+
 # This class is responsible for starting the chess game, playing and user
 # feedback
 class ChessGame:
@@ -636,14 +1221,19 @@ class ChessGame:
             new_score, best_move = self.make_computer_move()
             
             print("Best move: " + best_move)
+            print("Expected line: " +
+                  " ".join(ChessComputer.principal_variation))
             print("Score to achieve: " + str(new_score))
             print("")
             self.make_human_move()
 
+    # The tables of ChessComputer are kept between turns, so the search
+    # reuses what it learned about the positions of the previous turns
     def make_computer_move(self):
         print("Calculating best move...")
+        ChessComputer.new_search()
         return ChessComputer.computer_move(self.chessboard,
-                self.depth, alphabeta=True)
+                self.depth, alphabeta=True, quiescence=True)
 
     def make_human_move(self):
         # Endlessly request input until the right input is specified
@@ -682,5 +1272,6 @@ class ChessGame:
             print("Black wins!")
             sys.exit(0)
 
-chess_game = ChessGame(Side.White)
-chess_game.main()
\ No newline at end of file
+if __name__ == "__main__":
+    chess_game = ChessGame(Side.White)
+    chess_game.main()
\ No newline at end of file
@@ -0,0 +1,222 @@
+#!python2
+
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from timeit import default_timer
+
+import numpy as np
+
+from umi_common import *
+from umi_board_geometry import Chessboard_model, SQUARES
+from umi_distance_matrix import Distance_matrix, Reachability_table
+import umi_student_functions
+from umi_student_functions import UMI, apply_inverse_kinematics, board_position_to_cartesian, plan_move
+from chessgame import ChessBoard, ChessComputer, Side
+
+# Fields of the board, without the garbage location.
+FIELDS = SQUARES[:64]
+
+def best_time(function, repeat):
+    ''' Runs a function a number of times, and gives the fastest time, which is the least
+        disturbed by other processes.
+        :param function: Function without arguments.
+        :param repeat: Number of runs.
+        :return: Time of the fastest run in seconds.
+    '''
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        function()
+        times.append(default_timer() - start)
+    return min(times)
+
+def result(calls, seconds, **extra):
+    ''' Gives the result of a benchmark as a dictionary for the JSON output.
+    '''
+    entry = {"calls": calls, "seconds": round(seconds, 6),
+             "per_second": round(calls / seconds, 1) if seconds > 0 else None,
+             "microseconds_per_call": round(1e6 * seconds / calls, 3) if calls else None}
+    entry.update(extra)
+    return entry
+
+def benchmark_inverse_kinematics(chessboard, repeat, count=10000):
+    ''' Solves the inverse kinematics for random positions above the board, one call each. '''
+    random = np.random.RandomState(0)
+    centers = np.array([board_position_to_cartesian(chessboard, field) for field in FIELDS])
+    targets = centers[random.randint(0, 64, count)] + np.array([0, 0.1, 0]) * random.uniform(0, 1, (count, 1))
+    targets = targets.tolist()
+
+    def run():
+        for (x, y, z) in targets:
+            apply_inverse_kinematics(x, y, z, 0.0)
+    return result(count, best_time(run, repeat))
+
+def benchmark_board_position_to_cartesian(chessboard, repeat, rounds=100):
+    ''' Converts all fields of the board to world coordinates. '''
+    def run():
+        for _ in range(rounds):
+            for field in FIELDS:
+                board_position_to_cartesian(chessboard, field)
+    return result(rounds * 64, best_time(run, repeat))
+
+def random_layouts(count, pieces):
+    ''' Gives random sets of occupied fields, always the same for the same arguments. '''
+    random = np.random.RandomState(1)
+    layouts = []
+    for _ in range(count):
+        fields = [FIELDS[i] for i in random.choice(64, pieces, replace=False)]
+        layouts.append(dict((field, [None, "Pawn", "White"]) for field in fields))
+    return layouts
+
+def benchmark_distance_transform(repeat, count=200):
+    ''' Computes distance transforms for random layouts of 16 pieces, without (cold) and with
+        (warm) the cache of Distance_matrix. '''
+    boards = []
+    for (i, pieces) in enumerate(random_layouts(count, 16)):
+        board = Chessboard_model()
+        board.pieces = pieces
+        targets = [field for field in FIELDS if field not in pieces]
+        boards.append((board, targets[i % len(targets)]))
+    distance_matrix = Distance_matrix()
+
+    def run():
+        for (board, target) in boards:
+            distance_matrix.distance_transform(board, target)
+
+    def run_cold():
+        Distance_matrix.cache.clear()
+        run()
+    cold = best_time(run_cold, repeat)
+    run()
+    warm = best_time(run, repeat)
+    return {"cold": result(count, cold), "warm": result(count, warm)}
+
+def benchmark_move(repeat):
+    ''' Plans the move of a rook between all pairs of fields (64x64, without moves to the same
+        field) on an otherwise empty board, with empty caches (cold) and with filled caches (warm). '''
+    board = Chessboard_model()
+    pairs = [(from_pos, to_pos) for from_pos in FIELDS for to_pos in FIELDS if from_pos != to_pos]
+    impossible = []
+
+    def run():
+        del impossible[:]
+        for (from_pos, to_pos) in pairs:
+            board.pieces = {from_pos: [None, "Rook", "White"]}
+            try:
+                plan_move(board, from_pos, to_pos)
+            except ValueError:
+                impossible.append((from_pos, to_pos))
+
+    def run_cold():
+        umi_student_functions.PATH_CACHE.clear()
+        Distance_matrix.cache.clear()
+        Reachability_table.cache.clear()
+        board.pose_table = None
+        run()
+    cold = best_time(run_cold, repeat)
+    run()
+    warm = best_time(run, repeat)
+    return {"cold": result(len(pairs), cold, impossible=len(impossible)),
+            "warm": result(len(pairs), warm, impossible=len(impossible))}
+
+def benchmark_joint_files(repeat, rows=100000):
+    ''' Writes and reads a trajectory in the csv joints file and the binary trajectory format. '''
+    random = np.random.RandomState(2)
+    (minimum, maximum) = (np.array([UMI.joint_ranges[name][0] for name in UMI.joint_names]),
+                          np.array([UMI.joint_ranges[name][1] for name in UMI.joint_names]))
+    parameter_lines = (minimum + random.uniform(0, 1, (rows, 5)) * (maximum - minimum)).tolist()
+    for i in range(0, rows, 50):
+        parameter_lines.insert(i, ["GUI", "TAKE", "a1"])
+
+    directory = tempfile.mkdtemp()
+    try:
+        csv_file = os.path.join(directory, "joints.txt")
+        binary_file = os.path.join(directory, "joints.bin")
+        results = {
+            "csv_write": best_time(lambda: write_parameters_to_file(parameter_lines, csv_file), repeat),
+            "csv_read": best_time(lambda: read_parameters_from_file(csv_file), repeat),
+            "csv_stream_read": best_time(lambda: sum(1 for _ in iter_parameters_from_file(csv_file)), repeat),
+            "binary_write": best_time(lambda: write_trajectory(parameter_lines, binary_file), repeat),
+            "binary_read": best_time(lambda: np.array(read_trajectory(binary_file)[0]), repeat),
+            "binary_replay": best_time(lambda: sum(1 for _ in iter_trajectory(binary_file)), repeat),
+        }
+    finally:
+        shutil.rmtree(directory)
+    return dict((name, result(len(parameter_lines), seconds)) for (name, seconds) in results.items())
+
+def benchmark_chess_search(repeat, depth=3):
+    ''' Searches the position of test_board.chb with alpha-beta. '''
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(directory, "test_board.chb")) as f:
+        content = f.read()
+    chessboard = ChessBoard(Side.White)
+    chessboard.load_from_input(content)
+
+    def run():
+        ChessComputer.transposition_table.clear()
+        ChessComputer.killer_moves.clear()
+        ChessComputer.history.clear()
+        ChessComputer.nodes = 0
+        ChessComputer.computer_move(chessboard, depth, alphabeta=True)
+    seconds = best_time(run, repeat)
+    return result(ChessComputer.nodes, seconds, depth=depth)
+
+def git_commit():
+    ''' Gives the commit of the working directory, or None outside of a git repository. '''
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=devnull,
+                                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(repeat=3, quick=False):
+    '''
+        Runs all benchmarks.
+        :param repeat: Number of runs of every benchmark, the fastest run is reported.
+        :param quick: Use fewer calls, for a fast check.
+        :return: Dictionary with the results, as written to the JSON output.
+    '''
+    scale = 10 if quick else 1
+    chessboard = Chessboard_model()
+    benchmarks = {
+        "inverse_kinematics": benchmark_inverse_kinematics(chessboard, repeat, 10000 // scale),
+        "board_position_to_cartesian": benchmark_board_position_to_cartesian(chessboard, repeat, 100 // scale),
+        "distance_transform": benchmark_distance_transform(repeat, 200 // scale),
+        "joint_files": benchmark_joint_files(repeat, 100000 // scale),
+        "chess_search": benchmark_chess_search(repeat, 2 if quick else 3),
+    }
+    if not quick:
+        benchmarks["move"] = benchmark_move(repeat)
+    return {
+        "benchmarks": benchmarks,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "machine": platform.machine(), "commit": git_commit()},
+        "settings": {"repeat": repeat, "quick": quick},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the speed of the kinematics, the path planning and the chess engine.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every benchmark, the fastest is reported")
+    parser.add_argument("--quick", action="store_true", help="fewer calls, and no planning of all moves")
+    parser.add_argument("--output", help="file for the JSON results (default: standard output)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.quick)
+    # Sorted keys and a fixed layout, so the output of two commits can be compared line by line.
+    text = json.dumps(results, indent=2, sort_keys=True, separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+from umi_common import *
+from umi_kinematics import inverse_kinematics
+
+# We assume that 20 centimeter above the board is safe.
+SAFE_HEIGHT = 0.2
+# We assume that 10 centimeter above the board is "low".
+LOW_HEIGHT = 0.1
+# Location next to the board where captured pieces are dropped.
+GARBAGE_LOCATION = "j5"
+
+# All fields of the board, followed by the garbage location.
+SQUARES = [to_notation((x, z)) for x in range(8) for z in range(8)] + [GARBAGE_LOCATION]
+
+# Heights of the pieces in meters.
+PIECES_HEIGHT = {"Pawn" : 0.05, "King" : 0.07, "Rook" : 0.06, "Queen" : 0.065, "Bishop" : 0.055}
+
+class Chessboard_model:
+    '''
+        The position, angle and pieces of a chessboard, with the same interface as UMI_chessboard
+        but without a display. Used to plan the movements of the arm without VPython.
+        Pieces are stored as [None, name, color], like the [object, name, color] of UMI_chessboard.
+    '''
+    def __init__(self, board_size=0.3, position_x_z = (0.15, -0.15), angle_degrees=0):
+        # Dimensions of the board
+        self.chessboard_size = board_size
+        self.field_size = (self.chessboard_size / 8.0)
+        self.mplhght = (self.chessboard_size / 15.0)
+
+        # Heights of the pieces:
+        self.pieces_height = dict(PIECES_HEIGHT)
+        self.pieces = dict()
+        self.pose_table = None
+        self.position = (0.0, self.mplhght, 0.0)
+        self.board_angle = 0.0
+        self.set_pos_angle(position_x_z, angle_degrees)
+
+    def add_piece(self, position, name, color):
+        ''' Registers a piece on a position of the board.
+            :param position: [a1-h8]
+            :param name: "Pawn", "King", "Rook", "Queen" or "Bishop"
+            :param color: "White" or "Black"
+        '''
+        self.pieces[position] = [None, name, color]
+
+    def remove_piece(self, position):
+        ''' Removes a piece from a stored location on the board, and return its data
+            :param position: [a1-h8]
+            :return: List [None, name, color], or None if the position is empty.
+        '''
+        return self.pieces.pop(position, None)
+
+    def get_board_height(self):
+        ''' Gives the height of the board.
+            :return: Returns the height of the board in meters.
+        '''
+        return self.mplhght
+
+    def set_angle_radians(self, radians):
+        ''' Sets the angle of the board, based of the corner next to h8
+            :param radians: The angle of the board in radians.
+        '''
+        self.board_angle = radians
+        self.pose_table = None
+
+    def set_angle_degrees(self, degrees):
+        ''' Sets the angle of the board, based of the corner next to h8
+            :param degrees: The angle of the board in degrees.
+        '''
+        self.set_angle_radians(np.radians(degrees))
+
+    def get_angle_radians(self):
+        ''' Gives the angle of the board in radians.
+        '''
+        return self.board_angle
+
+    def get_angle_degrees(self):
+        ''' Gives the angle of the board in degrees.
+        '''
+        return np.degrees(self.get_angle_radians())
+
+    def set_position(self, x, z):
+        ''' Sets the horizontal position of the board, based of the corner next to h8
+            :param x: The forward distance away from the robot arm
+            :param z: The left/right distance away from the robot arm
+        '''
+        self.position = (x, self.mplhght, z)
+        self.pose_table = None
+
+    def get_position(self):
+        ''' Gives the position of the corner next to h8.
+            :return: Tuple containing the x, y and z coordinate.
+        '''
+        return self.position
+
+    def set_pos_angle(self, position_x_z, angle_degrees):
+        ''' Sets the horizontal position of the board, and afterwards the angle based of the corner next to h8
+            :param position_x_z: Tuple in the form (x, z)
+            :param angle_degrees: The angle in degrees
+        '''
+        self.set_position(position_x_z[0], position_x_z[1])
+        self.set_angle_degrees(angle_degrees)
+
+def get_pose(chessboard):
+    ''' Gives everything that determines where the fields of a board are.
+        :param chessboard: Chessboard object
+        :return: Tuple (x, y, z, angle in radians, field size).
+    '''
+    (x, y, z) = chessboard.get_position()
+    return (x, y, z, chessboard.get_angle_radians(), chessboard.field_size)
+
+def parameters_key(umi):
+    ''' Gives a value that changes whenever one of the parameters of UMI changes.
+        :param umi: UMI_parameters object
+        :return: Tuple of the names and values of all parameters.
+    '''
+    return tuple(sorted((name, repr(value)) for (name, value) in vars(umi).items()))
+
+def squares_to_cartesian(pose, notations):
+    ''' Vectorized version of board_position_to_cartesian, for a board pose as given by get_pose.
+        :param pose: Tuple (x, y, z, angle in radians, field size)
+        :param notations: List of positions [a1-h8] (positions next to the board are allowed).
+        :return: Array with shape (N, 3) of (x, y, z) world coordinates.
+    '''
+    (board_x, board_y, board_z, angle, field_size) = pose
+    coordinates = np.array([to_coordinate(notation) for notation in notations], dtype=float).reshape(-1, 2)
+    # The center of the fields in the frame of the board, h8 is next to the rotation point.
+    local_x = field_size * (7 - coordinates[:, 0]) + field_size / 2.0
+    local_z = field_size * (7 - coordinates[:, 1]) + field_size / 2.0
+    world = np.empty((len(coordinates), 3))
+    world[:, 0] = board_x + local_x * np.cos(angle) - local_z * np.sin(angle)
+    world[:, 1] = board_y
+    world[:, 2] = board_z + local_x * np.sin(angle) + local_z * np.cos(angle)
+    return world
+
+class Pose_table:
+    '''
+        Precomputed world coordinates and joint values for all fields of the board and the
+        garbage location, for one board pose. The joint values are computed for the safe
+        height, the low height and the grip height (half the height) of every kind of piece,
+        all with a single call to the batch inverse kinematics.
+    '''
+    def __init__(self, chessboard, umi):
+        self.pose = get_pose(chessboard)
+        self.index = dict((notation, i) for (i, notation) in enumerate(SQUARES))
+        self.world = squares_to_cartesian(self.pose, SQUARES)
+
+        self.umi = umi
+        self.umi_key = parameters_key(umi)
+
+        # Heights above the board for which the joint values are stored.
+        self.heights = {"safe": SAFE_HEIGHT, "low": LOW_HEIGHT, None: 0.0}
+        for (name, height) in chessboard.pieces_height.items():
+            self.heights[name] = height / 2.0
+
+        # Rows are stored as lists, so a lookup does not have to convert them.
+        self.rows = dict((key, []) for key in self.heights)
+        self.reachable = dict((key, []) for key in self.heights)
+        self.add_rows(self.world)
+
+    def add_rows(self, world):
+        ''' Computes and stores the joint values for the given field centers.
+        '''
+        keys = list(self.heights)
+        targets = np.concatenate([world + (0, self.heights[key], 0) for key in keys])
+        (joints, reachable) = inverse_kinematics(self.umi, targets, 0.0)
+        joints = joints.reshape(len(keys), len(world), 5)
+        reachable = reachable.reshape(len(keys), len(world))
+        for (i, key) in enumerate(keys):
+            self.rows[key] += joints[i].tolist()
+            self.reachable[key] += reachable[i].tolist()
+
+    def add_square(self, notation):
+        ''' Adds a location that is not in the table yet, such as a field next to the board.
+        '''
+        world = squares_to_cartesian(self.pose, [notation])
+        self.index[notation] = len(self.world)
+        self.world = np.concatenate([self.world, world])
+        self.add_rows(world)
+
+    def is_valid_for(self, chessboard):
+        ''' Checks whether this table was computed for the current pose of the board, and the
+            current parameters of UMI.
+        '''
+        return self.pose == get_pose(chessboard) and self.umi_key == parameters_key(self.umi)
+
+    def __contains__(self, notation):
+        return notation in self.index
+
+    def cartesian(self, notation):
+        ''' Gives the world coordinates of the center of a field.
+            :param notation: [a1-h8] or the garbage location.
+            :return: Tuple (x, y, z)
+        '''
+        if notation not in self.index:
+            self.add_square(notation)
+        return tuple(self.world[self.index[notation]].tolist())
+
+    def joints(self, notation, height, gripper):
+        ''' Gives the joint values to hover above a field.
+            :param notation: [a1-h8] or the garbage location.
+            :param height: "safe", "low", or the name of a piece to use half its height.
+                None gives the height of the board.
+            :param gripper: The width of the gripper in meters.
+            :return: List with the values of the riser, shoulder, elbow, wrist and gripper.
+        '''
+        if notation not in self.index:
+            self.add_square(notation)
+        row = self.rows[height][self.index[notation]][:]
+        row[4] = gripper
+        return row
@@ -6,19 +6,26 @@ from visual.graph import *
 from visual.controls import *
 
 from umi_common import *
+from umi_board_geometry import Chessboard_model
 
-class UMI_chessboard:
+class UMI_chessboard(Chessboard_model):
+    '''
+        The chessboard of the simulator: a Chessboard_model that is also shown in the VPython scene.
+    '''
     def __init__(self, frameworld, board_size=0.3, position_x_z = (0.15, -0.15), angle_degrees=0):
-        # Dimensions of the board
-        self.chessboard_size = board_size
-        self.field_size = (self.chessboard_size / 8.0)
+        # Set the frame of the chessboard, it follows the position and angle of the board.
+        self.framemp = frame(frame=frameworld)
+
+        # Dimensions, heights of the pieces, and the position and angle of the board, where the
+        # rotational axis is H8
+        Chessboard_model.__init__(self, board_size, position_x_z, angle_degrees)
+        self.framemp.pos.y = self.mplhght
 
         # Edges of the locations
         self.wallthck = self.field_size / 15.0
         self.wallhght = self.field_size / 15.0
 
         # Position of the center of the board
-        self.mplhght = (self.chessboard_size / 15.0)
         self.mplcent = self.chessboard_size
 
         # Colors of the board
@@ -29,91 +36,29 @@ class UMI_chessboard:
         self.black_pieces_color = (0, 0, 0)
         self.white_pieces_color = (1, 1, 1)
 
-        # Set the frame of the chessboard.
-        self.framemp = frame(frame=frameworld)
-        self.framemp.pos =(0, self.mplhght,0)
-
-        # Heights of the pieces:
-        self.pieces_height = {"Pawn" : 0.05, "King" : 0.07, "Rook" : 0.06}
         # Create the board on screen
         self.generate_board()
 
         # Add the pieces
         self.add_pieces()
 
-        # Set the angle and position of the board, where the rotational axis is H8
-        self.set_pos_angle(position_x_z, angle_degrees)
-
-
-    def remove_piece(self, position):
-        '''
-        Removes a piece from a stored location on the board, and return the object
-        :param position: [a1-h8]
-        :return: A VPython object (box/cylinder/pyramid)
-        '''
-        if position in self.pieces:
-            piece_data = self.pieces.pop(position, None)
-            return piece_data
-        else:
-            return None
-
-    def get_board_height(self):
-        ''' Gives the height of the board.
-            :return: Returns the height of the board in meters.
-        '''
-        return self.mplhght
-
     def set_angle_radians(self, radians):
         ''' Sets the angle of the board, based of the corner next to h8
             :param radians: The angle of the board in radians.
         '''
+        Chessboard_model.set_angle_radians(self, radians)
         ## Rotate the board
         self.framemp.axis = (cos(radians),0,sin(radians))
-        # Used to read the radians of the board.
-        self.board_angle = radians
-
-    def set_angle_degrees(self, degrees):
-        ''' Sets the angle of the board, based of the corner next to h8
-            :param degrees: The angle of the board in degrees.
-        '''
-        self.set_angle_radians(radians(degrees))
-
-    def get_angle_radians(self):
-        ''' Gives the angle of the board in radians.
-            :return: Returns the angle of the board in radians.
-        '''
-        return self.board_angle
-
-    def get_angle_degrees(self):
-        ''' Gives the angle of the board in degrees.
-            :return: Returns the angle of the board in degrees.
-        '''
-        ## Rotate the board
-        return degrees(self.get_angle_radians())
 
     def set_position(self, x, z):
         ''' Sets the horizontal position of the board, based of the corner next to h8
             :param x: The forward distance away from the robot arm
             :param z: The left/right distance away from the robot arm
         '''
+        Chessboard_model.set_position(self, x, z)
         self.framemp.pos.x = x
         self.framemp.pos.z = z
 
-    def get_position(self):
-        ''' Returns a copy of the position (so students don't accidentally edit it)
-            :param x: The forward distance away from the robot arm
-            :return: Tuple containing the x, y and z coordinate.
-        '''
-        return (self.framemp.pos.x, self.framemp.pos.y, self.framemp.pos.z)
-
-    def set_pos_angle(self, position_x_z, angle_degrees):
-        ''' Sets the horizontal position of the board, and afterwards the angle based of the corner next to h8
-            :param position_x_z: Tuple in the form (x, z)
-            :param angle_degrees: The angle in degrees
-        '''
-        self.set_position(position_x_z[0], position_x_z[1])
-        self.set_angle_degrees(angle_degrees)
-
     def generate_board(self):
         ''' Generates the visual display of the chessboard.
         '''
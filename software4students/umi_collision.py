@@ -0,0 +1,157 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+from umi_common import *
+from umi_kinematics import forward_kinematics
+from umi_trajectory import is_gui_command, interpolate_rows
+
+# All fields of the board, the index of a field is x * 8 + z of its coordinate.
+FIELDS = [to_notation((x, z)) for x in range(8) for z in range(8)]
+# Pieces with a square base (a box or pyramid in UMI_chessboard), the others are cylinders.
+SQUARE_PIECES = ("Rook", "King")
+# Half the width of the base of a piece, or its radius, relative to the field size.
+PIECE_HALF_WIDTH = 0.35
+# Width of a finger of the gripper, and half its length along the arm.
+FINGER_WIDTH = 0.005
+FINGER_HALF_LENGTH = 0.015
+
+def to_board_frame(chessboard, positions):
+    ''' Converts world coordinates to the horizontal coordinates of the board, in which the
+        field x, z has its center at (field_size * (7 - x + 0.5), field_size * (7 - z + 0.5)).
+        :param chessboard: Chessboard object
+        :param positions: Array with shape (N, 3) of (x, y, z) world coordinates.
+        :return: Array with shape (N, 2).
+    '''
+    (board_x, board_y, board_z) = chessboard.get_position()
+    angle = chessboard.get_angle_radians()
+    dx = positions[:, 0] - board_x
+    dz = positions[:, 2] - board_z
+    return np.column_stack([dx * np.cos(angle) + dz * np.sin(angle),
+                            -dx * np.sin(angle) + dz * np.cos(angle)])
+
+def field_centers(chessboard):
+    ''' Gives the centers of the fields of FIELDS in the frame of the board, as an array with shape (64, 2).
+    '''
+    coordinates = np.array([to_coordinate(field) for field in FIELDS], dtype=float)
+    return chessboard.field_size * (7.5 - coordinates)
+
+def sequence_segments(chessboard, sequence_list):
+    '''
+        Replays the GUI instructions of a sequence to find the pieces on the board during every
+        movement (segment) between two joint rows.
+        :param chessboard: Chessboard object with the pieces at the start of the sequence.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :return: Tuple (rows, row_indices, heights, square, carried, excluded), with for the
+            joint rows and every segment between them:
+            rows: array with shape (N, 5) of the joint rows,
+            row_indices: the index in sequence_list of every joint row,
+            heights: array with shape (N - 1, 64), the height of the piece on every field (0 if empty),
+            square: boolean array with shape (N - 1, 64), True for pieces with a square base,
+            carried: array with shape (N - 1,), the height of the piece in the gripper (0 if none),
+            excluded: boolean array with shape (N - 1, 64), True for the fields the gripper takes
+            a piece from or drops a piece on before or after the segment, the gripper has to
+            touch the piece on those fields.
+    '''
+    pieces = dict((position, piece[1]) for (position, piece) in chessboard.pieces.items())
+    in_gripper = None
+    rows = []
+    row_indices = []
+    states = []
+    # Fields of the GUI instructions after every joint row.
+    event_fields = [[]]
+    for (i, line) in enumerate(sequence_list):
+        if is_gui_command(line):
+            [_, command, position] = line
+            event_fields[-1].append(position)
+            if command == "TAKE" and in_gripper == None:
+                in_gripper = pieces.pop(position, None)
+            elif command == "DROP" and in_gripper != None:
+                if position in FIELDS:
+                    pieces[position] = in_gripper
+                in_gripper = None
+        else:
+            if rows:
+                # The state of the movement from the previous row to this one.
+                states.append((dict(pieces), in_gripper))
+            rows.append(line)
+            row_indices.append(i)
+            event_fields.append([])
+
+    segments = max(len(rows) - 1, 0)
+    heights = np.zeros((segments, 64))
+    square = np.zeros((segments, 64), dtype=bool)
+    carried = np.zeros(segments)
+    excluded = np.zeros((segments, 64), dtype=bool)
+    index = dict((field, i) for (i, field) in enumerate(FIELDS))
+    for (segment, (board_pieces, piece_in_gripper)) in enumerate(states):
+        for (position, name) in board_pieces.items():
+            if position in index:
+                heights[segment, index[position]] = chessboard.pieces_height[name]
+                square[segment, index[position]] = name in SQUARE_PIECES
+        if piece_in_gripper != None:
+            carried[segment] = chessboard.pieces_height[piece_in_gripper]
+    # Every segment excludes the fields of the GUI instructions before and after it.
+    all_events = [field for fields in event_fields for field in fields]
+    seen = len(event_fields[0])
+    for segment in range(segments):
+        seen += len(event_fields[segment + 1])
+        for field in all_events[max(seen - 1, 0):seen + 1]:
+            if field in index:
+                excluded[segment, index[field]] = True
+    return (np.array(rows, dtype=float).reshape(-1, 5), row_indices, heights, square, carried, excluded)
+
+def find_collisions(chessboard, sequence_list, umi, steps=20, clearance=0.0):
+    '''
+        Checks whether the gripper, or the piece it carries, hits a piece on the board while the
+        arm runs a sequence. Every movement between two joint rows is sampled in steps, the
+        positions of the gripper are computed with forward kinematics, and all samples are
+        tested against all pieces at once. Pieces are bounding boxes (Rook, King) or cylinders
+        (the others) on their field. The gripper is a cylinder around its fingers, from its tip
+        up to the wrist, and a carried piece is held at half its height.
+        :param chessboard: Chessboard object with the pieces at the start of the sequence.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :param steps: Number of samples per movement between two joint rows.
+        :param clearance: Extra distance in meters that is kept from all pieces.
+        :return: List of tuples (index in sequence_list of the row the arm moves to, field of the
+            piece that is hit, "gripper" or "piece"), in the order of the sequence.
+    '''
+    (rows, row_indices, heights, square, carried, excluded) = sequence_segments(chessboard, sequence_list)
+    if len(rows) < 2:
+        return []
+    samples = interpolate_rows(rows, steps)[1:]
+    segment = np.arange(len(samples)) // steps
+    tips = forward_kinematics(umi, samples)
+    tip_height = tips[:, 1] - chessboard.get_board_height()
+
+    # Horizontal offsets of all samples to all fields (samples, 64, 2).
+    offsets = to_board_frame(chessboard, tips)[:, np.newaxis, :] - field_centers(chessboard)[np.newaxis, :, :]
+    half_width = PIECE_HALF_WIDTH * chessboard.field_size
+    # Distance to a square base, or to a round base, of every piece.
+    distance = np.where(square[segment],
+                        np.hypot(*np.maximum(np.abs(offsets) - half_width, 0.0).transpose(2, 0, 1)),
+                        np.maximum(np.hypot(offsets[..., 0], offsets[..., 1]) - half_width, 0.0))
+    piece_tops = heights[segment]
+    present = (piece_tops > 0) & ~excluded[segment]
+
+    gripper_radius = np.maximum(FINGER_HALF_LENGTH, samples[:, 4] / 2.0 + FINGER_WIDTH) + clearance
+    gripper_hits = present & (distance < gripper_radius[:, np.newaxis]) \
+        & (tip_height[:, np.newaxis] < piece_tops + clearance)
+    carried_height = carried[segment]
+    piece_hits = present & (carried_height[:, np.newaxis] > 0) \
+        & (distance < half_width + clearance) \
+        & ((tip_height - carried_height / 2.0)[:, np.newaxis] < piece_tops + clearance)
+
+    collisions = []
+    for (hits, part) in ((gripper_hits, "gripper"), (piece_hits, "piece")):
+        (sample_index, field_index) = np.nonzero(hits)
+        for (s, f) in set(zip(segment[sample_index].tolist(), field_index.tolist())):
+            collisions.append((row_indices[s + 1], FIELDS[f], part))
+    return sorted(collisions)
+
+def is_collision_free(chessboard, sequence_list, umi, steps=20, clearance=0.0):
+    ''' Checks whether a sequence can be run without hitting a piece, see find_collisions.
+    '''
+    return not find_collisions(chessboard, sequence_list, umi, steps, clearance)
@@ -1,6 +1,10 @@
 #!python2
 from __future__ import division, print_function
 import csv
+import os
+import sys
+
+import numpy as np
 
 def to_coordinate(notation):
     """ Given a notation in the form [a1-h8], return the corresponding notation
@@ -25,14 +29,27 @@ def to_notation(coordinates):
     number = x + 1
     return letter + str(number)
 
+# Header of the joints file of the simulator.
+JOINTS_HEADER = ['Riser', 'Shoulder', 'Elbow', 'Wrist', 'Gripper']
+
+def open_csv_file(filename, mode):
+    """ Opens a file for the csv module, in binary mode for Python 2 and without newline
+        translation for Python 3.
+        :param filename: Name of the file.
+        :param mode: 'r' or 'w'
+    """
+    if sys.version_info[0] < 3:
+        return open(filename, mode + 'b')
+    return open(filename, mode, newline='')
+
 def write_parameters_to_file(parameter_lines, output_file):
     """ Given a list of instructions, save it to a file so it can be read later.
         :param parameter_lines: List containing the intructions to both the arm and the GUI.
         :param output_file: Name of the file in which the output will be stored.
     """
-    with open(output_file, 'wb') as csv_file:
+    with open_csv_file(output_file, 'w') as csv_file:
         csv_writer = csv.writer(csv_file, delimiter=',')
-        csv_writer.writerow(['Riser', 'Shoulder', 'Elbow', 'Wrist', 'Gripper'])
+        csv_writer.writerow(JOINTS_HEADER)
         for line in parameter_lines:
             csv_writer.writerow(line)
 
@@ -40,23 +57,143 @@ def write_parameters_to_umi_robot(parameter_lines):
     """ Given a list of instructions, save it to a file so it can be read later by the actual UMI robot.
         :param parameter_lines: TList containing the intructions to both the arm and the GUI.
     """
-    with open("joints.txt", 'wb') as csv_file:
+    with open_csv_file("joints.txt", 'w') as csv_file:
         csv_writer = csv.writer(csv_file, delimiter=' ')
-        for line in parameter_lines:
-            if len(line) == 5:
-                csv_writer.writerow([line[0]*1000.0, line[1], line[2], line[3], -90.0, 0.0, 0.0, line[4]*1000.0])
+        csv_writer.writerows(to_umi_robot_rows(parameter_lines))
+
+def to_umi_robot_rows(parameter_lines):
+    """ Converts the joint rows of a sequence of instructions to the rows of the actual UMI robot,
+        leaving out the instructions to the GUI. The rows are generated one by one.
+        :param parameter_lines: Iterable containing the intructions to both the arm and the GUI.
+        :return: Generator of rows in millimeters and degrees.
+    """
+    for line in parameter_lines:
+        if len(line) == 5:
+            yield [line[0]*1000.0, line[1], line[2], line[3], -90.0, 0.0, 0.0, line[4]*1000.0]
 
 def read_parameters_from_file(input_file):
     """ Read the file as written by write_parameters_to_file
         :param input_file: Name of the file in which the input is stored.
     """
-    with open(input_file, 'rb') as csv_file:
+    with open_csv_file(input_file, 'r') as csv_file:
         csv_reader = csv.reader(csv_file, delimiter=',')
         headers = next(csv_reader)
-        parameter_lines = []
-        for line in csv_reader:
-            if len(line) > 3:
-                parameter_lines.append([float(x) for x in line])
-            elif line[0] == "GUI":
-                parameter_lines.append(line)
+        parameter_lines = list(iter_parameter_lines(csv_reader))
     return (headers, parameter_lines)
+
+def iter_parameters_from_file(input_file):
+    """ Reads the file as written by write_parameters_to_file one line at a time, so long files
+        do not have to be loaded at once.
+        :param input_file: Name of the file in which the input is stored.
+        :return: Generator of instructions to both the arm and the GUI, without the header.
+    """
+    with open_csv_file(input_file, 'r') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=',')
+        next(csv_reader)
+        for line in iter_parameter_lines(csv_reader):
+            yield line
+
+def iter_parameter_lines(csv_reader):
+    """ Converts the rows of a csv reader to instructions, joint values are converted to floats.
+    """
+    for line in csv_reader:
+        if len(line) > 3:
+            yield [float(x) for x in line]
+        elif line[0] == "GUI":
+            yield line
+
+def stream_parameters_to_file(parameter_lines, output_file, flush_every=1):
+    """ Writes instructions to a file while they are generated, so the first instructions can be
+        read before the last ones are computed.
+        :param parameter_lines: Iterable (e.g. a generator) of instructions to the arm and the GUI.
+        :param output_file: Name of the file in which the output will be stored.
+        :param flush_every: Number of lines after which the file is flushed.
+        :return: Number of lines written.
+    """
+    count = 0
+    with open_csv_file(output_file, 'w') as csv_file:
+        csv_writer = csv.writer(csv_file, delimiter=',')
+        csv_writer.writerow(JOINTS_HEADER)
+        csv_file.flush()
+        for line in parameter_lines:
+            csv_writer.writerow(line)
+            count += 1
+            if count % flush_every == 0:
+                csv_file.flush()
+    return count
+
+## Binary trajectories
+#
+# A binary trajectory consists of two files. The file itself contains only the joint rows,
+# as little-endian float32 records of TRAJECTORY_DTYPE, without a header, so it can be opened
+# with numpy.memmap. The instructions to the GUI are stored in a side table, a csv file with
+# the same name followed by TRAJECTORY_EVENTS_SUFFIX. Each of its rows starts with the number
+# of joint rows that come before the instruction.
+
+TRAJECTORY_DTYPE = np.dtype([(name, '<f4') for name in JOINTS_HEADER])
+TRAJECTORY_EVENTS_SUFFIX = ".events"
+
+def write_trajectory(parameter_lines, output_file, chunk_size=1024):
+    """ Writes instructions to a binary trajectory while they are generated.
+        :param parameter_lines: Iterable of instructions to the arm and the GUI.
+        :param output_file: Name of the trajectory file, the GUI instructions are written to
+            output_file + TRAJECTORY_EVENTS_SUFFIX.
+        :param chunk_size: Number of joint rows that are collected before they are written.
+        :return: Number of joint rows written.
+    """
+    count = 0
+    chunk = []
+    with open(output_file, 'wb') as trajectory_file, \
+            open_csv_file(output_file + TRAJECTORY_EVENTS_SUFFIX, 'w') as events_file:
+        events_writer = csv.writer(events_file, delimiter=',')
+        for line in parameter_lines:
+            if len(line) == 5:
+                chunk.append(tuple(line))
+                count += 1
+                if len(chunk) == chunk_size:
+                    np.array(chunk, dtype=TRAJECTORY_DTYPE).tofile(trajectory_file)
+                    chunk = []
+            else:
+                events_writer.writerow([count] + list(line))
+        if chunk:
+            np.array(chunk, dtype=TRAJECTORY_DTYPE).tofile(trajectory_file)
+    return count
+
+def read_trajectory(input_file):
+    """ Opens a binary trajectory without reading the joint rows into memory.
+        :param input_file: Name of the trajectory file.
+        :return: Tuple (joints, events): a read-only numpy.memmap of TRAJECTORY_DTYPE records,
+            and a list of tuples (number of joint rows before the instruction, instruction).
+    """
+    if os.path.getsize(input_file) == 0:
+        # An empty file can not be mapped.
+        joints = np.zeros(0, dtype=TRAJECTORY_DTYPE)
+    else:
+        joints = np.memmap(input_file, dtype=TRAJECTORY_DTYPE, mode='r')
+    events = []
+    with open_csv_file(input_file + TRAJECTORY_EVENTS_SUFFIX, 'r') as events_file:
+        for line in csv.reader(events_file, delimiter=','):
+            events.append((int(line[0]), line[1:]))
+    return (joints, events)
+
+def trajectory_to_array(joints):
+    """ Gives the joint rows of a trajectory as an array with shape (N, 5) of float32, without
+        copying the rows of a memmap.
+    """
+    return joints.view('<f4').reshape(-1, len(JOINTS_HEADER))
+
+def iter_trajectory(input_file):
+    """ Replays a binary trajectory as instructions, in the format of read_parameters_from_file.
+        Only the joint rows that are being replayed are read from the file.
+        :param input_file: Name of the trajectory file.
+        :return: Generator of instructions to both the arm and the GUI.
+    """
+    (joints, events) = read_trajectory(input_file)
+    rows = trajectory_to_array(joints)
+    start = 0
+    for (index, event) in events + [(len(rows), None)]:
+        for row in rows[start:index]:
+            yield row.tolist()
+        start = index
+        if event != None:
+            yield event
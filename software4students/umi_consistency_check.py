@@ -0,0 +1,173 @@
+#!python2
+
+# Checks that the incremental and batched versions of the low path planning give the same
+# results as a plain computation:
+# - Distance_matrix.update (the repair of a distance transform after pieces were moved) against
+#   a full distance transform of the new occupancy, after random sequences of moved pieces.
+# - Reachability_table against a breadth-first search from every location.
+# It also checks that plan_move with the straight line (cartesian) option never gives a path
+# that the arm takes longer for than the default path.
+# The script exits with status 1 when a difference is found, so it can be run after changes.
+#
+# Usage:
+#   python umi_consistency_check.py [--count 2000] [--seed 0]
+
+from __future__ import division, print_function
+import argparse
+import sys
+from collections import deque
+
+import numpy as np
+
+from umi_common import *
+from umi_distance_matrix import Distance_matrix, Reachability_table, NEIGHBOURS, occupancy_mask
+from umi_board_geometry import Chessboard_model
+from umi_student_functions import plan_move, path_duration
+
+# Fields of the board, without the garbage location.
+FIELDS = [to_notation((x, z)) for x in range(8) for z in range(8)]
+
+def random_pieces(random, count):
+    ''' Gives a random set of occupied fields, as a dictionary like Chessboard.pieces. '''
+    fields = [FIELDS[i] for i in random.choice(64, count, replace=False)]
+    return dict((field, [None, "Pawn", "White"]) for field in fields)
+
+def check_distance_updates(count=2000, updates=8, seed=0):
+    '''
+        Repairs distance transforms with random changes of the occupied fields, and compares
+        every repaired transform with a full transform of the same occupancy.
+        :param count: Number of random boards.
+        :param updates: Number of updates per board, each vacating and filling up to 3 fields.
+        :param seed: Seed of the random boards.
+        :return: List of tuples (board number, update number, target) where the results differ.
+    '''
+    random = np.random.RandomState(seed)
+    mismatches = []
+    for i in range(count):
+        board = Chessboard_stub(random_pieces(random, random.randint(0, 40)))
+        target = FIELDS[random.randint(64)]
+        distance_matrix = Distance_matrix()
+        distance_matrix.distance_transform(board, target)
+        for j in range(updates):
+            occupied = [field for field in FIELDS if field in board.pieces]
+            empty = [field for field in FIELDS if field not in board.pieces]
+            vacated = [occupied[k] for k in random.permutation(len(occupied))[:random.randint(0, 4)]]
+            filled = [empty[k] for k in random.permutation(len(empty))[:random.randint(0, 4)]]
+            for field in vacated:
+                del board.pieces[field]
+            for field in filled:
+                board.pieces[field] = [None, "Pawn", "White"]
+            # Without the cache, the repair itself is used.
+            Distance_matrix.cache.clear()
+            distance_matrix.update(vacated=vacated, filled=filled)
+            expected = Distance_matrix.compute_transform(occupancy_mask(board.pieces), to_coordinate(target))
+            if not np.array_equal(distance_matrix.distance_matrix, expected):
+                mismatches.append((i, j, target))
+    Distance_matrix.cache.clear()
+    return mismatches
+
+def breadth_first_distances(mask, start):
+    '''
+        Gives the low path distances from one location to all others: the path may start and
+        end on an occupied location, but only passes over empty ones.
+        :param mask: Occupancy mask as given by occupancy_mask.
+        :param start: Coordinates (x, z) of the start location.
+        :return: 8x8 array with the number of steps, UNREACHABLE where there is no low path.
+    '''
+    distances = np.full((8, 8), Reachability_table.UNREACHABLE, dtype=int)
+    distances[start] = 0
+    queue = deque([start])
+    while queue:
+        (x, z) = queue.popleft()
+        if (x, z) != start and (mask >> (x*8 + z)) & 1:
+            continue
+        for (u, v) in NEIGHBOURS[(x, z)]:
+            if distances[u, v] == Reachability_table.UNREACHABLE:
+                distances[u, v] = distances[x, z] + 1
+                queue.append((u, v))
+    return distances
+
+def check_reachability(count=200, seed=1):
+    '''
+        Compares the reachability tables of random boards with a breadth-first search from
+        every location.
+        :param count: Number of random boards.
+        :param seed: Seed of the random boards.
+        :return: List of tuples (board number, from, to) where the distances differ.
+    '''
+    random = np.random.RandomState(seed)
+    mismatches = []
+    for i in range(count):
+        mask = occupancy_mask(random_pieces(random, random.randint(0, 48)))
+        table = Reachability_table(mask)
+        for from_pos in FIELDS:
+            expected = breadth_first_distances(mask, to_coordinate(from_pos))
+            for to_pos in FIELDS:
+                if table.distance(from_pos, to_pos) != expected[to_coordinate(to_pos)]:
+                    mismatches.append((i, from_pos, to_pos))
+    return mismatches
+
+def check_cartesian_duration(count=200, seed=2):
+    '''
+        Plans random moves on random boards with and without the cartesian option of plan_move,
+        and compares how long the arm takes for them.
+        :param count: Number of random moves.
+        :param seed: Seed of the random boards and moves.
+        :return: List of tuples (move, default duration, cartesian duration) of the moves for
+            which the cartesian path is slower.
+    '''
+    random = np.random.RandomState(seed)
+    # At this position the arm can reach all fields.
+    board = Chessboard_model(position_x_z=(0.16, -0.21))
+    slower = []
+    for i in range(count):
+        pieces = random_pieces(random, random.randint(1, 17))
+        from_pos = sorted(pieces)[random.randint(len(pieces))]
+        pieces[from_pos][1] = ["Pawn", "Rook", "King"][random.randint(3)]
+        to_pos = [field for field in FIELDS if field != from_pos][random.randint(63)]
+        board.pieces = pieces
+        # A capture starts with the captured piece.
+        start_pos = to_pos if to_pos in pieces else from_pos
+        default = path_duration(board, plan_move(board, from_pos, to_pos), start_pos, to_pos)
+        cartesian = path_duration(board, plan_move(board, from_pos, to_pos, cartesian=True),
+                                  start_pos, to_pos)
+        if cartesian > default + 1e-9:
+            slower.append((from_pos + to_pos, default, cartesian))
+    return slower
+
+class Chessboard_stub:
+    ''' The pieces of a board, all that the distance transform needs. '''
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the incremental distance transforms, the reachability tables and the straight line paths.")
+    parser.add_argument("--count", type=int, default=2000, help="number of random boards for the distance transforms")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random boards")
+    args = parser.parse_args()
+
+    failed = False
+    mismatches = check_distance_updates(args.count, seed=args.seed)
+    print("Distance_matrix.update: %d mismatches in %d updates" % (len(mismatches), args.count * 8))
+    for (board, update, target) in mismatches[:10]:
+        print("  board %d, update %d, target %s" % (board, update, target))
+    failed = failed or bool(mismatches)
+
+    count = max(1, args.count // 10)
+    mismatches = check_reachability(count, seed=args.seed + 1)
+    print("Reachability_table: %d mismatches in %d boards" % (len(mismatches), count))
+    for (board, from_pos, to_pos) in mismatches[:10]:
+        print("  board %d, %s to %s" % (board, from_pos, to_pos))
+    failed = failed or bool(mismatches)
+
+    count = max(1, args.count // 10)
+    slower = check_cartesian_duration(count, seed=args.seed + 2)
+    print("plan_move(cartesian=True): %d of %d moves slower than the default path" % (len(slower), count))
+    for (move, default, cartesian) in slower[:10]:
+        print("  %s: %.3f s instead of %.3f s" % (move, cartesian, default))
+    failed = failed or bool(slower)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
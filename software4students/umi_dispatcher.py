@@ -0,0 +1,310 @@
+#!python3
+
+# Streams planned joint rows to a robot controller while the next moves are planned. This
+# module uses asyncio and therefore needs Python 3 (3.7 or newer), unlike the rest of the
+# planner, which also runs on Python 2.
+#
+# The controller is reached over TCP ("host:port") or a Unix domain socket (a path), and
+# speaks a line based protocol:
+#   dispatcher -> controller:  ROW <number> <8 values of a joints.txt row>
+#                              DONE
+#   controller -> dispatcher:  ACK <number>            the row has been executed
+#                              ERROR <number> <cause>  the row was refused
+#                              BYE                     answer to DONE
+# At most `window` rows are sent without being acknowledged, so the dispatcher never runs
+# ahead of the arm by more than that (besides the socket buffers, see StreamWriter.drain).
+#
+# Usage:
+#   python umi_dispatcher.py controller [--address 127.0.0.1:5005] [--time-scale 1.0]
+#   python umi_dispatcher.py dispatch board.chb a2a3 h7h6 ... [--address 127.0.0.1:5005]
+
+from __future__ import division, print_function
+import argparse
+import asyncio
+import sys
+
+from umi_common import *
+from umi_board_geometry import Chessboard_model
+from umi_student_functions import UMI, plan_move
+from umi_trajectory import move_duration, validate_trajectory
+from umi_game_planner import Planning_error, load_chessboard, pieces_from_chessboard
+
+DEFAULT_ADDRESS = "127.0.0.1:5005"
+
+class Controller_error(Exception):
+    ''' Raised when the controller refuses a row. '''
+    pass
+
+def parse_address(address):
+    ''' Gives (host, port) for an address "host:port", or None for the path of a Unix socket. '''
+    if ":" in address:
+        (host, port) = address.rsplit(":", 1)
+        return (host, int(port))
+    return None
+
+async def open_connection(address):
+    ''' Connects to a controller, see parse_address. '''
+    host_port = parse_address(address)
+    if host_port == None:
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*host_port)
+
+def from_umi_robot_row(row):
+    ''' Converts a row of the actual UMI robot (millimeters) back to a joint row (meters),
+        the inverse of to_umi_robot_rows.
+    '''
+    return [row[0] / 1000.0, row[1], row[2], row[3], row[7] / 1000.0]
+
+class Robot_dispatcher:
+    '''
+        Sends joint rows to a controller, and keeps track of the acknowledgements.
+    '''
+    def __init__(self, reader, writer, window=8):
+        self.reader = reader
+        self.writer = writer
+        self.window = asyncio.Semaphore(window)
+        self.sent = 0
+        self.acknowledged = 0
+        self.error = None
+        self.all_acknowledged = asyncio.Event()
+        self.all_acknowledged.set()
+        self.bye = asyncio.Event()
+        self.acknowledgements = asyncio.ensure_future(self.read_acknowledgements())
+
+    @staticmethod
+    async def connect(address, window=8):
+        (reader, writer) = await open_connection(address)
+        return Robot_dispatcher(reader, writer, window)
+
+    async def read_acknowledgements(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            words = line.decode().split()
+            if not words:
+                continue
+            if words[0] == "ACK":
+                self.acknowledged = int(words[1])
+                self.window.release()
+                if self.acknowledged == self.sent:
+                    self.all_acknowledged.set()
+            elif words[0] == "ERROR":
+                self.error = Controller_error("Row %s refused: %s" % (words[1], " ".join(words[2:])))
+                # No rows are sent after a refused one.
+                self.writer.close()
+                break
+            elif words[0] == "BYE":
+                self.bye.set()
+                break
+        # Wake up everyone that waits for the controller.
+        self.all_acknowledged.set()
+        self.bye.set()
+        self.window.release()
+
+    def check(self):
+        if self.error != None:
+            raise self.error
+
+    async def send_row(self, row):
+        ''' Sends one row of the actual UMI robot, waits while the window is full. '''
+        await self.window.acquire()
+        self.check()
+        self.sent += 1
+        self.all_acknowledged.clear()
+        values = " ".join(repr(float(value)) for value in row)
+        self.writer.write(("ROW %d %s\n" % (self.sent, values)).encode())
+        await self.writer.drain()
+
+    async def send_sequence(self, sequence_list):
+        ''' Sends the joint rows of a sequence, the GUI instructions are left out. '''
+        for row in to_umi_robot_rows(sequence_list):
+            await self.send_row(row)
+
+    async def wait_until_executed(self):
+        ''' Waits until the controller acknowledged all rows that were sent. '''
+        await self.all_acknowledged.wait()
+        self.check()
+
+    async def close(self):
+        ''' Waits for the last rows, and ends the connection. '''
+        await self.wait_until_executed()
+        self.writer.write(b"DONE\n")
+        await self.writer.drain()
+        await self.bye.wait()
+        self.writer.close()
+        await self.acknowledgements
+
+async def dispatch_moves(address, chessboard, moves, robot_board=None, window=8, lookahead=1):
+    '''
+        Plans moves and sends their joint rows to a controller. The next moves are planned (in
+        a separate thread) while the controller executes the rows of the previous ones.
+        :param address: Address of the controller, "host:port" or the path of a Unix socket.
+        :param chessboard: ChessBoard object of chessgame with the starting position, against
+            which the moves are checked.
+        :param moves: Iterable of move strings, e.g. ['a2a3', 'h7h6'].
+        :param robot_board: Chessboard object with the pose of the real board. By default a
+            Chessboard_model at the default pose of the simulator is used. Its pieces are
+            replaced by the pieces of the starting position, and updated with every move.
+        :param window: Number of rows that may be sent before they are acknowledged.
+        :param lookahead: Number of planned moves that may wait to be sent.
+        :return: List of tuples (move, number of joint rows) of the executed moves.
+        :raises Planning_error: If a move is illegal or the arm can not make it. The moves
+            before it are executed first, and robot_board keeps the pieces from before the move.
+        :raises Controller_error: If the controller refuses a row, no more moves are planned.
+    '''
+    if robot_board == None:
+        robot_board = Chessboard_model()
+    robot_board.pieces = pieces_from_chessboard(chessboard)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=lookahead)
+
+    def plan(move):
+        (from_pos, to_pos) = (move[0:2], move[2:4])
+        sequence_list = plan_move(robot_board, from_pos, to_pos)
+        robot_board.remove_piece(to_pos)
+        robot_board.pieces[to_pos] = robot_board.remove_piece(from_pos)
+        return sequence_list
+
+    async def planner():
+        game = chessboard
+        try:
+            for move in moves:
+                if not game.is_valid_move(move):
+                    raise Planning_error(move, "Illegal move " + move)
+                try:
+                    sequence_list = await loop.run_in_executor(None, plan, move)
+                except ValueError as e:
+                    raise Planning_error(move, str(e))
+                game = game.make_move(move)
+                await queue.put((move, sequence_list))
+        finally:
+            await queue.put(None)
+
+    dispatcher = await Robot_dispatcher.connect(address, window)
+    planning = asyncio.ensure_future(planner())
+
+    def stop_planning(acknowledgements):
+        # After a refused row, the next moves are not planned any more.
+        if dispatcher.error != None:
+            planning.cancel()
+    dispatcher.acknowledgements.add_done_callback(stop_planning)
+
+    executed = []
+    try:
+        while True:
+            item = await queue.get()
+            if item == None:
+                break
+            (move, sequence_list) = item
+            await dispatcher.send_sequence(sequence_list)
+            executed.append((move, len(list(to_umi_robot_rows(sequence_list)))))
+        await dispatcher.close()
+    finally:
+        if not planning.done():
+            planning.cancel()
+        # Let the planner end, also when the controller refused a row.
+        await asyncio.wait([planning])
+    # Raises the errors of the planner, such as a move the arm can not make.
+    try:
+        await planning
+    except Planning_error as e:
+        e.planned = executed
+        raise
+    return executed
+
+class Simulated_controller:
+    '''
+        Stands in for the controller of the robot: it checks every row against the joint ranges,
+        waits as long as the arm would need to get there, and acknowledges it.
+    '''
+    def __init__(self, umi, time_scale=1.0):
+        '''
+            :param umi: UMI_parameters object
+            :param time_scale: Factor for the time the movements take, 0 to not wait at all.
+        '''
+        self.umi = umi
+        self.time_scale = time_scale
+        self.executed = []
+
+    async def handle(self, reader, writer):
+        previous = None
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            words = line.decode().split()
+            if words[0] == "ROW":
+                number = int(words[1])
+                row = from_umi_robot_row([float(value) for value in words[2:]])
+                problem = validate_trajectory([row], self.umi)
+                if problem != None:
+                    writer.write(("ERROR %d %s\n" % (number, problem[1])).encode())
+                    await writer.drain()
+                    break
+                if previous != None and self.time_scale > 0:
+                    await asyncio.sleep(move_duration(self.umi, previous, row) * self.time_scale)
+                previous = row
+                self.executed.append(row)
+                writer.write(("ACK %d\n" % number).encode())
+                await writer.drain()
+            elif words[0] == "DONE":
+                writer.write(b"BYE\n")
+                await writer.drain()
+                break
+        writer.close()
+
+    async def start(self, address):
+        ''' Starts listening on an address, see parse_address.
+            :return: asyncio Server object
+        '''
+        host_port = parse_address(address)
+        if host_port == None:
+            return await asyncio.start_unix_server(self.handle, address)
+        return await asyncio.start_server(self.handle, *host_port)
+
+async def serve_controller(address, time_scale):
+    controller = Simulated_controller(UMI, time_scale)
+    server = await controller.start(address)
+    print("Simulated controller listening on " + address)
+    await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams the joint rows of planned moves to a robot controller.")
+    subparsers = parser.add_subparsers(dest="command")
+    controller_parser = subparsers.add_parser("controller", help="run a simulated controller")
+    controller_parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or path of a Unix socket")
+    controller_parser.add_argument("--time-scale", type=float, default=1.0,
+                                   help="factor for the time the movements take, 0 to not wait")
+    dispatch_parser = subparsers.add_parser("dispatch", help="plan moves and send them to a controller")
+    dispatch_parser.add_argument("board", help=".chb file with the starting position")
+    dispatch_parser.add_argument("moves", nargs="+", help="moves to play, e.g. a2a3")
+    dispatch_parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or path of a Unix socket")
+    dispatch_parser.add_argument("--window", type=int, default=8, help="rows that may wait for an acknowledgement")
+    args = parser.parse_args()
+
+    if args.command == "controller":
+        try:
+            asyncio.run(serve_controller(args.address, args.time_scale))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "dispatch":
+        chessboard = load_chessboard(args.board)
+        try:
+            executed = asyncio.run(dispatch_moves(args.address, chessboard, args.moves,
+                                                  window=args.window))
+        except Planning_error as e:
+            for (move, rows) in e.planned:
+                print(move + ": " + str(rows) + " joint rows executed")
+            print("Error: " + str(e), file=sys.stderr)
+            sys.exit(1)
+        except Controller_error as e:
+            print("Error: " + str(e), file=sys.stderr)
+            sys.exit(1)
+        for (move, rows) in executed:
+            print(move + ": " + str(rows) + " joint rows executed")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,36 @@
 #!python2
 from __future__ import division, print_function
 from umi_common import *
-from collections import deque
+from collections import OrderedDict
+from heapq import heappush, heappop
+import numpy as np
+
+# The neighbours of every board location (assuming 4-connectivity), computed once.
+NEIGHBOURS = dict(
+    ((x, z), [(u,v) for (u,v) in [(x+1, z), (x-1, z), (x, z+1), (x, z-1)] if (u >=0 and u < 8 and v >=0 and v < 8)])
+    for x in range(8) for z in range(8))
+
+def occupancy_mask(pieces):
+    '''
+        Gives the occupied board locations as a 64-bit mask, where location (x, z)
+        is bit x*8 + z.
+        :param pieces: Dictionary (or list) with the occupied positions [a1-h8] as keys.
+        :return: Integer mask.
+    '''
+    mask = 0
+    for notation in pieces:
+        (x, z) = to_coordinate(notation)
+        if 0 <= x < 8 and 0 <= z < 8:
+            mask |= 1 << (x*8 + z)
+    return mask
+
+def mask_to_array(mask):
+    '''
+        Converts an occupancy mask to an 8x8 boolean array, True where occupied.
+    '''
+    bits = [(mask >> i) & 1 for i in range(64)]
+    return np.array(bits, dtype=bool).reshape(8, 8)
+
 class Distance_matrix:
     '''
         This class it implements a distance matrix. It can be used
@@ -10,12 +39,21 @@ class Distance_matrix:
     OCCUPIED = -1
     UNREACHABLE = -2
     NOT_FOUND = 1000
+
+    # Results of distance transforms, keyed by (occupancy mask, target coordinates),
+    # the most recently used last. Shared by all distance matrices.
+    cache = OrderedDict()
+    cache_size = 4096
+
     def __init__(self):
         '''
             This method uses the locations of the pieces on the board
             to initialise the distance matrix.
         '''
-        self.distance_matrix = [[self.UNREACHABLE for z in range(8)] for x in range(8)]
+        self.distance_matrix = np.full((8, 8), self.UNREACHABLE, dtype=np.int8)
+        # Occupancy mask and target coordinates of the current distance transform.
+        self.mask = None
+        self.target = None
 
 
     def __str__(self):
@@ -52,10 +90,7 @@ class Distance_matrix:
         '''
         lowest_value = self.NOT_FOUND
         best_neighbour = None
-        # Generate all valid options.
-        options = [(u,v) for (u,v) in [(x+1, z), (x-1, z), (x, z+1), (x, z-1)] if (u >=0 and u < 8 and v >=0 and v < 8)]
-
-        for (x_temp, z_temp) in options:
+        for (x_temp, z_temp) in NEIGHBOURS[(x, z)]:
             score = self.distance_matrix[x_temp][z_temp]
             if score < lowest_value and score >= 0:
                 lowest_value = score
@@ -70,7 +105,7 @@ class Distance_matrix:
             False if a low path to that location is possible.
         '''
         (x,z) = to_coordinate(target_notation)
-        if self.distance_matrix[x][z] == UNREACHABLE:
+        if self.distance_matrix[x][z] == self.UNREACHABLE:
             return True
         else:
             return False
@@ -90,31 +125,240 @@ class Distance_matrix:
             In terms of path planning a high path should be planned then.
             :param target_notation: The target location to use when generating the transform.
         '''
-        # Initialize the distance matrix with the current chessboard.
-        self.distance_matrix = [[self.UNREACHABLE for z in range(8)] for x in range(8)]
-        for notation in chessboard.pieces:
+        # The result only depends on the occupied locations and the target, so it is cached.
+        self.mask = occupancy_mask(chessboard.pieces)
+        self.target = to_coordinate(target_notation)
+        self.distance_matrix = Distance_matrix.transform(self.mask, self.target)
+
+    def update(self, vacated=(), filled=()):
+        '''
+            This method updates the distance transform after pieces were moved, without
+            computing it again: only the locations whose distance depends on the changed
+            locations are repaired. The result is the same as a new call to
+            distance_transform with the new positions of the pieces.
+            :param vacated: Positions [a1-h8] that became empty.
+            :param filled: Positions [a1-h8] that became occupied.
+        '''
+        mask = self.mask
+        for notation in vacated:
             (x, z) = to_coordinate(notation)
-            self.distance_matrix[x][z] = self.OCCUPIED
+            mask &= ~(1 << (x*8 + z))
+        for notation in filled:
+            (x, z) = to_coordinate(notation)
+            mask |= 1 << (x*8 + z)
+        changed = [to_coordinate(notation) for notation in list(vacated) + list(filled)]
 
-        # Get the target coordinates.
-        (x,z) = to_coordinate(target_notation)
+        key = (mask, self.target)
+        if key in Distance_matrix.cache:
+            distances = Distance_matrix.transform(mask, self.target)
+        else:
+            distances = Distance_matrix.repair(self.distance_matrix, mask, self.target, changed)
+            distances.flags.writeable = False
+            Distance_matrix.store(key, distances)
+        self.mask = mask
+        self.distance_matrix = distances
 
-        # Set targetfield to 0 (you want to try move here, after all.)
-        self.distance_matrix[x][z] = 0
-
-        options = [(u,v) for (u,v) in [(x+1, z), (x-1, z), (x, z+1), (x, z-1)] if (u >=0 and u < 8 and v >=0 and v < 8)]
-        to_process = deque(options)
-        while len(to_process) > 0:
-            (new_x, new_z) = to_process.popleft()
-            if self.distance_matrix[new_x][new_z] == self.UNREACHABLE:
-                (best_neighbour, lowest_value) = self.smallest_positive_neighbour(new_x, new_z)
-                # If it has no neighbour that has a good score, it is unreachable, so it can remain unchanged.
-                if best_neighbour == None:
+    @staticmethod
+    def repair(distance_matrix, mask, target, changed):
+        '''
+            Repairs a distance transform for a new occupancy mask, which differs from the old
+            one only in the changed locations. Works like a dynamic breadth-first search:
+            1. The distances that depended on a newly occupied location are removed, in order of
+               distance, from the location onwards. A location keeps its distance as long as a
+               neighbour still has a distance one lower.
+            2. The removed and the newly empty locations get new distances from their
+               neighbours, and lower distances are spread to the rest of the board.
+            :param distance_matrix: The old distance transform.
+            :param mask: The new occupancy mask.
+            :param target: Coordinates (x, z) of the target location.
+            :param changed: Coordinates of the locations of which the occupancy changed.
+            :return: New 8x8 int8 array with the distances.
+        '''
+        OCCUPIED = Distance_matrix.OCCUPIED
+        UNREACHABLE = Distance_matrix.UNREACHABLE
+        distances = distance_matrix.tolist()
+        to_invalidate = []
+        to_recompute = []
+        for (x, z) in changed:
+            if (x, z) == target:
+                continue
+            occupied = (mask >> (x*8 + z)) & 1
+            old = distances[x][z]
+            if occupied and old != OCCUPIED:
+                distances[x][z] = OCCUPIED
+                if old >= 0:
+                    heappush(to_invalidate, (old, (x, z)))
+            elif not occupied and old == OCCUPIED:
+                distances[x][z] = UNREACHABLE
+                to_recompute.append((x, z))
+
+        # 1. Remove the distances that are no longer supported.
+        while to_invalidate:
+            (old, (x, z)) = heappop(to_invalidate)
+            for (u, v) in NEIGHBOURS[(x, z)]:
+                value = distances[u][v]
+                if value != old + 1:
                     continue
-                # Generate all new neighbours, that have a path to the target.
-                self.distance_matrix[new_x][new_z] = lowest_value + 1
-                new_options = [
-                    (u,v) for (u,v) in [(new_x+1, new_z), (new_x-1, new_z), (new_x, new_z+1), (new_x, new_z-1)]
-                    if (u >=0 and u < 8 and v >=0 and v < 8 and self.distance_matrix[u][v] == self.UNREACHABLE)
-                ]
-                to_process.extend(new_options)
+                if any(distances[s][t] == value - 1 for (s, t) in NEIGHBOURS[(u, v)]):
+                    continue
+                distances[u][v] = UNREACHABLE
+                to_recompute.append((u, v))
+                heappush(to_invalidate, (value, (u, v)))
+
+        # 2. Give the empty locations without a distance a new one and spread it.
+        to_process = []
+        for (x, z) in to_recompute:
+            if distances[x][z] != UNREACHABLE:
+                continue
+            values = [distances[u][v] for (u, v) in NEIGHBOURS[(x, z)] if distances[u][v] >= 0]
+            if values:
+                heappush(to_process, (min(values) + 1, (x, z)))
+        while to_process:
+            (value, (x, z)) = heappop(to_process)
+            current = distances[x][z]
+            if current != UNREACHABLE and current <= value:
+                continue
+            distances[x][z] = value
+            for (u, v) in NEIGHBOURS[(x, z)]:
+                neighbour = distances[u][v]
+                if neighbour == UNREACHABLE or neighbour > value + 1:
+                    heappush(to_process, (value + 1, (u, v)))
+        return np.array(distances, dtype=np.int8)
+
+    @staticmethod
+    def transform(mask, target):
+        '''
+            Gives the distance transform for an occupancy mask and target coordinates,
+            from the cache when possible. The returned array is shared, and therefore read-only.
+            :param mask: Occupancy mask as given by occupancy_mask.
+            :param target: Coordinates (x, z) of the target location.
+            :return: 8x8 int8 array with the distances.
+        '''
+        key = (mask, target)
+        cache = Distance_matrix.cache
+        if key in cache:
+            distances = cache.pop(key)
+        else:
+            distances = Distance_matrix.compute_transform(mask, target)
+            distances.flags.writeable = False
+        Distance_matrix.store(key, distances)
+        return distances
+
+    @staticmethod
+    def store(key, distances):
+        '''
+            Stores a distance transform in the cache as the most recently used one, removing the
+            least recently used one when the cache is full.
+        '''
+        cache = Distance_matrix.cache
+        if key not in cache and len(cache) >= Distance_matrix.cache_size:
+            cache.popitem(last=False)
+        cache[key] = distances
+
+    @staticmethod
+    def compute_transform(mask, target):
+        '''
+            Computes the distance transform with a wavefront over the whole board: in every
+            step all empty, unvisited neighbours of the previous front get the next distance.
+            :param mask: Occupancy mask as given by occupancy_mask.
+            :param target: Coordinates (x, z) of the target location.
+            :return: 8x8 int8 array with the distances.
+        '''
+        occupied = mask_to_array(mask)
+        distances = np.full((8, 8), Distance_matrix.UNREACHABLE, dtype=np.int8)
+        distances[occupied] = Distance_matrix.OCCUPIED
+        free = ~occupied
+
+        # Set targetfield to 0 (you want to try move here, after all.)
+        front = np.zeros((8, 8), dtype=bool)
+        front[target] = True
+        distances[target] = 0
+        reached = front.copy()
+        distance = 0
+        while front.any():
+            distance += 1
+            grown = np.zeros((8, 8), dtype=bool)
+            grown[1:, :] |= front[:-1, :]
+            grown[:-1, :] |= front[1:, :]
+            grown[:, 1:] |= front[:, :-1]
+            grown[:, :-1] |= front[:, 1:]
+            front = grown & free & ~reached
+            distances[front] = distance
+            reached |= front
+        return distances
+
+# Adjacency matrix of the 64 board locations (location (x, z) has index x*8 + z).
+ADJACENCY = np.zeros((64, 64), dtype=np.uint8)
+for ((x, z), neighbours) in NEIGHBOURS.items():
+    for (u, v) in neighbours:
+        ADJACENCY[x*8 + z, u*8 + v] = 1
+
+class Reachability_table:
+    '''
+        This class holds the low path distances between all pairs of board locations
+        for one occupancy of the board. A low path may start and end on occupied
+        locations, but only passes over empty ones. All 64 breadth-first searches are
+        done at once, as a wavefront of 64x64 booleans that grows by one step per
+        multiplication with the adjacency matrix.
+    '''
+    UNREACHABLE = Distance_matrix.UNREACHABLE
+
+    # Tables of recent occupancies, keyed by occupancy mask, the most recently used last.
+    cache = OrderedDict()
+    cache_size = 64
+
+    def __init__(self, mask):
+        '''
+            Computes the distances for an occupancy mask as given by occupancy_mask.
+        '''
+        self.mask = mask
+        free = ~mask_to_array(mask).reshape(64)
+        distances = np.full((64, 64), self.UNREACHABLE, dtype=np.int8)
+        np.fill_diagonal(distances, 0)
+        reached = np.eye(64, dtype=bool)
+        # The searches continue from the start location, and from empty locations only.
+        front = np.eye(64, dtype=np.uint8)
+        distance = 0
+        while front.any():
+            distance += 1
+            new = (front.dot(ADJACENCY) > 0) & ~reached
+            distances[new] = distance
+            reached |= new
+            front = (new & free).astype(np.uint8)
+        distances.flags.writeable = False
+        self.distances = distances
+
+    @staticmethod
+    def for_board(chessboard):
+        '''
+            Gives the table for the current occupancy of a board, from the cache when possible.
+            :param chessboard: Chessboard object
+            :return: Reachability_table object
+        '''
+        mask = occupancy_mask(chessboard.pieces)
+        cache = Reachability_table.cache
+        if mask in cache:
+            table = cache.pop(mask)
+        else:
+            table = Reachability_table(mask)
+            if len(cache) >= Reachability_table.cache_size:
+                cache.popitem(last=False)
+        cache[mask] = table
+        return table
+
+    def distance(self, from_notation, to_notation):
+        '''
+            Gives the number of steps of the shortest low path between two locations.
+            :param from_notation: [a1-h8]
+            :param to_notation: [a1-h8]
+            :return: The number of steps, or UNREACHABLE if there is no low path.
+        '''
+        (x, z) = to_coordinate(from_notation)
+        (u, v) = to_coordinate(to_notation)
+        return int(self.distances[x*8 + z, u*8 + v])
+
+    def is_reachable(self, from_notation, to_notation):
+        '''
+            Checks whether a low path between two locations exists.
+        '''
+        return self.distance(from_notation, to_notation) != self.UNREACHABLE
@@ -0,0 +1,165 @@
+#!python2
+
+from __future__ import division, print_function
+import argparse
+import csv
+import sys
+
+import chessgame
+from chessgame import ChessBoard, ChessComputer, Material, Side
+from umi_common import *
+from umi_board_geometry import Chessboard_model
+from umi_student_functions import plan_move
+
+# Names of the pieces of the chess game as used by the robot.
+PIECE_NAMES = {Material.Rook: "Rook", Material.King: "King", Material.Pawn: "Pawn",
+               Material.Queen: "Queen", Material.Bishop: "Bishop"}
+SIDE_NAMES = {Side.White: "White", Side.Black: "Black"}
+
+class Planning_error(Exception):
+    ''' Raised when a move of a game can not be planned. The joint files end with the moves
+        before it, which are listed in planned as tuples (move, number of joint rows).
+    '''
+    def __init__(self, move, message, planned=None):
+        Exception.__init__(self, message)
+        self.move = move
+        self.planned = planned if planned != None else []
+
+def load_chessboard(filename, turn=Side.White):
+    ''' Reads a chess game position from a .chb file.
+        :param filename: Name of the .chb file.
+        :param turn: Side.White or Side.Black, used when the file does not say whose turn it is.
+        :return: ChessBoard object
+    '''
+    with open(filename) as f:
+        content = f.read()
+    chessboard = ChessBoard(turn)
+    chessboard.load_from_input(content)
+    return chessboard
+
+def pieces_from_chessboard(chessboard):
+    ''' Converts the pieces of a chess game position to the pieces of the robot.
+        :param chessboard: ChessBoard object of chessgame
+        :return: Dictionary {position: [None, name, color]} like UMI_chessboard.pieces.
+    '''
+    pieces = dict()
+    for x in range(8):
+        for y in range(8):
+            piece = chessboard.get_boardpiece((x, y))
+            if piece != None:
+                pieces[chessgame.to_notation((x, y))] = \
+                    [None, PIECE_NAMES[piece.material], SIDE_NAMES[piece.side]]
+    return pieces
+
+def is_game_over(chessboard):
+    ''' Checks whether one of the kings is captured or the side to move has no moves left.
+    '''
+    return chessboard.is_king_dead(Side.White) or chessboard.is_king_dead(Side.Black) \
+        or not chessboard.legal_moves()
+
+def engine_move(chessboard, depth):
+    ''' Lets the chess computer choose the next move.
+        :param chessboard: ChessBoard object of chessgame
+        :param depth: Search depth in plies.
+        :return: Move string, e.g. 'a2a3'
+    '''
+    ChessComputer.new_search()
+    (score, move) = ChessComputer.computer_move(chessboard, depth, alphabeta=True)
+    return move
+
+def plan_game(chessboard, moves=(), self_play=0, depth=2, robot_board=None,
+              output_file="joints_simulator.txt", umi_robot=False, cartesian=False):
+    '''
+    Plans all movements of the arm for a game, without the simulator. The given moves are
+    played first, followed by self_play moves chosen by the chess computer. Captured pieces
+    are moved to the garbage location. The joint values are written to the output file after
+    every move, so the robot (or the simulator) can start with the first moves right away.
+    :param chessboard: ChessBoard object of chessgame with the starting position.
+    :param moves: List of move strings, e.g. ['a2a3', 'h7h6'].
+    :param self_play: Number of moves to let the chess computer play after the given moves.
+    :param depth: Search depth of the chess computer.
+    :param robot_board: Chessboard object with the pose of the real board. By default a
+        Chessboard_model at the default pose of the simulator is used. Its pieces are replaced
+        by the pieces of the starting position.
+    :param output_file: Name of the joints file for the simulator.
+    :param umi_robot: Also write the joints file for the real robot (joints.txt).
+    :param cartesian: Carry the pieces in straight lines, see plan_move.
+    :return: List of tuples (move, number of joint rows) for all planned moves.
+    :raises Planning_error: If a given move is illegal or the arm can not make a move; the
+        moves before it are planned.
+    '''
+    if robot_board == None:
+        robot_board = Chessboard_model()
+    robot_board.pieces = pieces_from_chessboard(chessboard)
+    moves = list(moves)
+    planned = []
+
+    with open_csv_file(output_file, 'w') as csv_file:
+        writer = csv.writer(csv_file, delimiter=',')
+        writer.writerow(JOINTS_HEADER)
+        robot_file = None
+        robot_writer = None
+        if umi_robot:
+            robot_file = open_csv_file("joints.txt", 'w')
+            robot_writer = csv.writer(robot_file, delimiter=' ')
+        try:
+            while moves or (self_play > 0 and not is_game_over(chessboard)):
+                if moves:
+                    move = moves.pop(0)
+                    if not chessboard.is_valid_move(move):
+                        raise Planning_error(move, "Illegal move " + move, planned)
+                else:
+                    move = engine_move(chessboard, depth)
+                    self_play -= 1
+                (from_pos, to_pos) = (move[0:2], move[2:4])
+
+                try:
+                    sequence_list = plan_move(robot_board, from_pos, to_pos, cartesian)
+                except ValueError as e:
+                    # The files end with the last move that can be made.
+                    raise Planning_error(move, str(e), planned)
+                writer.writerows(sequence_list)
+                csv_file.flush()
+                if robot_writer != None:
+                    robot_writer.writerows(to_umi_robot_rows(sequence_list))
+                    robot_file.flush()
+
+                # Keep the pieces of the robot in sync with the game.
+                robot_board.remove_piece(to_pos)
+                robot_board.pieces[to_pos] = robot_board.remove_piece(from_pos)
+                chessboard = chessboard.make_move(move)
+                planned.append((move, len(sequence_list)))
+        finally:
+            if robot_file != None:
+                robot_file.close()
+    return planned
+
+def main():
+    parser = argparse.ArgumentParser(description="Plans the movements of the arm for a chess game.")
+    parser.add_argument("board", help=".chb file with the starting position")
+    parser.add_argument("moves", nargs="*", help="moves to play, e.g. a2a3")
+    parser.add_argument("--self-play", type=int, default=0,
+                        help="number of moves the chess computer plays after the given moves")
+    parser.add_argument("--depth", type=int, default=2, help="search depth of the chess computer")
+    parser.add_argument("--output", default="joints_simulator.txt", help="joints file for the simulator")
+    parser.add_argument("--umi-robot", action="store_true", help="also write joints.txt for the robot")
+    parser.add_argument("--cartesian", action="store_true", help="carry the pieces in straight lines")
+    args = parser.parse_args()
+
+    chessboard = load_chessboard(args.board)
+    try:
+        planned = plan_game(chessboard, args.moves, args.self_play, args.depth,
+                            output_file=args.output, umi_robot=args.umi_robot,
+                            cartesian=args.cartesian)
+    except Planning_error as e:
+        for (move, rows) in e.planned:
+            print(move + ": " + str(rows) + " joint rows")
+        print("Error: " + str(e), file=sys.stderr)
+        print("Only the first " + str(len(e.planned)) + " moves are in " + args.output, file=sys.stderr)
+        sys.exit(1)
+    for (move, rows) in planned:
+        print(move + ": " + str(rows) + " joint rows")
+    print("Planned " + str(len(planned)) + " moves to " + args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+from umi_common import *
+from umi_kinematics import forward_kinematics
+from umi_trajectory import is_gui_command, interpolate_rows
+
+class Headless_simulator:
+    '''
+        Runs sequences like execute_sequence of umi_simulation, but without VPython and wx and
+        without waiting: the arm is moved up to the safe height first, a TAKE attaches the piece
+        on the field to the gripper, and a DROP places it on the field, or removes it from the
+        game for a location next to the board (the garbage location). The simulator keeps the
+        pieces and the joints of the arm between sequences, so the moves of a game can be
+        checked one after another.
+    '''
+    def __init__(self, chessboard, umi, start_joints=None, steps_per_segment=1):
+        '''
+            :param chessboard: Chessboard object, its pieces are copied and not changed.
+            :param umi: UMI_parameters object
+            :param start_joints: Row of riser, shoulder, elbow, wrist and gripper values (in
+                meters and degrees) where the arm starts. By default the arm starts at the first
+                joint row of the first sequence.
+            :param steps_per_segment: Number of interpolated steps between two joint rows in the
+                gripper path. With 1 the path only contains the joint rows themselves.
+        '''
+        self.umi = umi
+        self.board_height = chessboard.get_board_height()
+        self.pieces = dict((position, list(piece)) for (position, piece) in chessboard.pieces.items())
+        self.joints = None if start_joints is None else list(start_joints)
+        self.steps_per_segment = steps_per_segment
+        # The piece in the gripper, as [object, name, color].
+        self.chess_piece = None
+        # Pieces dropped next to the board.
+        self.removed = []
+        # Instructions to the GUI with the position of the gripper, as (command, position, (x, y, z)).
+        self.events = []
+
+    def execute_sequence(self, sequence_list):
+        '''
+            Runs the commands of a sequence.
+            :param sequence_list: List where each row contains either a GUI command or a joints-setting for the arm.
+            :return: Array with shape (N, 3) of the positions of the tip of the gripper.
+        '''
+        if self.joints == None:
+            rows = [line for line in sequence_list if not is_gui_command(line)]
+            if not rows:
+                return np.zeros((0, 3))
+            self.joints = list(rows[0])
+        # First move up so you do not knock over anything.
+        safe_joints = list(self.joints)
+        safe_joints[0] = self.board_height + 0.2 + self.umi.total_arm_height
+
+        waypoints = [self.joints, safe_joints]
+        for line in sequence_list:
+            if is_gui_command(line):
+                self.gui_command(line[1], line[2], waypoints[-1])
+            else:
+                waypoints.append(list(line))
+        self.joints = waypoints[-1]
+        return forward_kinematics(self.umi, interpolate_rows(waypoints, self.steps_per_segment))
+
+    def gui_command(self, command, position, joints):
+        ''' Takes or drops a piece, like the GUI of the simulator.
+            :param command: "TAKE" or "DROP"
+            :param position: [a1-h8] or a location next to the board.
+            :param joints: The joint row of the arm at the time of the command.
+        '''
+        self.events.append((command, position, tuple(forward_kinematics(self.umi, joints)[0].tolist())))
+        if command == "TAKE" and self.chess_piece == None:
+            self.chess_piece = self.pieces.pop(position, None)
+        if command == "DROP" and self.chess_piece != None:
+            (x, z) = to_coordinate(position)
+            if x > 7 or x < 0 or z > 7 or z < 0:
+                # Garbage field
+                self.removed.append(self.chess_piece)
+            else:
+                self.pieces[position] = self.chess_piece
+            self.chess_piece = None
+
+def simulate_sequence(chessboard, sequence_list, umi, start_joints=None, steps_per_segment=1):
+    '''
+        Runs one sequence on a headless simulator.
+        :param chessboard: Chessboard object, its pieces are not changed.
+        :param sequence_list: List where each row contains either a GUI command or a joints-setting for the arm.
+        :param umi: UMI_parameters object
+        :param start_joints: Joint row where the arm starts, see Headless_simulator.
+        :param steps_per_segment: Number of interpolated steps between two joint rows.
+        :return: Tuple (pieces, path): the pieces after the sequence as a dictionary
+            {position: [object, name, color]}, and an array with shape (N, 3) of the
+            positions of the tip of the gripper.
+    '''
+    simulator = Headless_simulator(chessboard, umi, start_joints, steps_per_segment)
+    path = simulator.execute_sequence(sequence_list)
+    return (simulator.pieces, path)
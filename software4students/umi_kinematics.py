@@ -0,0 +1,177 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+# Elbow branches of the inverse kinematics. The upper and lower arm can reach a
+# position in two ways, mirrored in the line between the shoulder and the
+# target: with a positive (ELBOW_UP) or a negative (ELBOW_DOWN) elbow angle.
+ELBOW_UP = 1
+ELBOW_DOWN = -1
+
+def joint_limits(umi):
+    ''' Gives the joint ranges of UMI as two arrays, in the order of a joint row.
+        :param umi: UMI_parameters object
+        :return: Tuple (minimum, maximum) of arrays with shape (5,).
+    '''
+    ranges = np.array([umi.joint_ranges[name] for name in umi.joint_names], dtype=float)
+    return (ranges[:, 0], ranges[:, 1])
+
+def within_joint_limits(umi, joints):
+    ''' Checks rows of joint values against the joint ranges of UMI.
+        :param umi: UMI_parameters object
+        :param joints: Array with shape (N, 5) (riser, shoulder, elbow, wrist, gripper)
+        :return: Boolean array with shape (N,), True where all joints are within range.
+    '''
+    (minimum, maximum) = joint_limits(umi)
+    joints = np.asarray(joints, dtype=float)
+    return np.all((joints >= minimum) & (joints <= maximum), axis=1)
+
+def inverse_kinematics(umi, targets, gripper, branch=None):
+    ''' Computes the joint values for many real world positions of the gripper at once.
+        The wrist is turned such that the gripper keeps the same angle as the base of
+        the arm, so pieces are placed down in the same angle as they were picked up.
+        :param umi: UMI_parameters object
+        :param targets: Array with shape (N, 3) of (x, y, z) world coordinates.
+        :param gripper: Gripper width(s) in meters, a number or an array with shape (N,).
+        :param branch: ELBOW_UP or ELBOW_DOWN to force an elbow branch. By default
+            (None) ELBOW_UP is used where it is within the joint ranges, and ELBOW_DOWN
+            otherwise.
+
+        :return: Tuple (joints, reachable): an array with shape (N, 5) of riser (meters),
+            shoulder, elbow and wrist (degrees) and gripper (meters) values, and a boolean
+            array with shape (N,) that is True for the targets that can be reached
+            within the joint ranges. Rows of positions out of reach of the arm are NaN.
+    '''
+    targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+    l1 = umi.upper_length
+    l2 = umi.lower_length
+
+    # The riser only moves the arm up and down.
+    riser = targets[:, 1] + umi.total_arm_height
+
+    # The distance from the shoulder to the target in the horizontal plane determines
+    # the elbow angle (law of cosines).
+    squared_distance = targets[:, 0]**2 + targets[:, 2]**2
+    cos_elbow = (squared_distance - l1**2 - l2**2) / (2.0 * l1 * l2)
+    in_reach = np.abs(cos_elbow) <= 1.0
+    elbow_up = np.arccos(np.clip(cos_elbow, -1.0, 1.0))
+
+    joints_up = joints_for_elbow(targets, riser, elbow_up, gripper, l1, l2)
+    if branch == ELBOW_UP:
+        joints = joints_up
+    elif branch == ELBOW_DOWN:
+        joints = joints_for_elbow(targets, riser, -elbow_up, gripper, l1, l2)
+    else:
+        joints_down = joints_for_elbow(targets, riser, -elbow_up, gripper, l1, l2)
+        use_down = ~within_joint_limits(umi, joints_up) & within_joint_limits(umi, joints_down)
+        joints = np.where(use_down[:, np.newaxis], joints_down, joints_up)
+
+    joints[~in_reach, 1:4] = np.nan
+    reachable = in_reach & within_joint_limits(umi, joints)
+    return (joints, reachable)
+
+def joints_for_elbow(targets, riser, elbow, gripper, l1, l2):
+    ''' Computes the joint rows for the given elbow angles (in radians).
+    '''
+    # The shoulder points to the target, corrected for the angle the elbow adds.
+    shoulder = np.arctan2(targets[:, 2], targets[:, 0]) \
+        - np.arctan2(l2 * np.sin(elbow), l1 + l2 * np.cos(elbow))
+    # Keep the shoulder angle in [-pi, pi).
+    shoulder = (shoulder + np.pi) % (2.0 * np.pi) - np.pi
+    wrist = -(shoulder + elbow)
+
+    joints = np.empty((len(targets), 5))
+    joints[:, 0] = riser
+    joints[:, 1] = np.degrees(shoulder)
+    joints[:, 2] = np.degrees(elbow)
+    joints[:, 3] = np.degrees(wrist)
+    joints[:, 4] = gripper
+    return joints
+
+def forward_kinematics(umi, joints):
+    ''' Computes the position of the tip of the gripper for many joint combinations at once,
+        without the VPython scene. The tip is straight below the wrist joint, so the wrist
+        angle and the gripper width do not change its position.
+        :param umi: UMI_parameters object
+        :param joints: Array with shape (N, 5) (or (5,)) of riser (meters), shoulder, elbow,
+            wrist (degrees) and gripper (meters) values.
+        :return: Array with shape (N, 3) of (x, y, z) world coordinates.
+    '''
+    joints = np.asarray(joints, dtype=float).reshape(-1, 5)
+    shoulder = np.radians(joints[:, 1])
+    elbow = shoulder + np.radians(joints[:, 2])
+
+    positions = np.empty((len(joints), 3))
+    positions[:, 0] = umi.upper_length * np.cos(shoulder) + umi.lower_length * np.cos(elbow)
+    positions[:, 1] = joints[:, 0] - umi.total_arm_height
+    positions[:, 2] = umi.upper_length * np.sin(shoulder) + umi.lower_length * np.sin(elbow)
+    return positions
+
+def sample_lines(waypoints, spacing):
+    ''' Samples the straight lines between consecutive points at a fixed spacing.
+        :param waypoints: Array with shape (N, D) of points, e.g. (x, y, z, gripper).
+        :param spacing: Largest distance between two samples, measured over the first three values.
+        :return: Tuple (samples, indices): an array with shape (M, D) that starts and ends with
+            the first and last waypoint, and the index in samples of every waypoint.
+    '''
+    waypoints = np.asarray(waypoints, dtype=float)
+    lengths = np.linalg.norm(np.diff(waypoints[:, :3], axis=0), axis=1)
+    steps = np.maximum(1, np.ceil(lengths / spacing)).astype(int)
+    parts = [waypoints[:1]]
+    for (i, count) in enumerate(steps):
+        fractions = np.arange(1, count + 1)[:, np.newaxis] / count
+        parts.append(waypoints[i] + fractions * (waypoints[i + 1] - waypoints[i]))
+    indices = np.concatenate([[0], np.cumsum(steps)])
+    return (np.concatenate(parts), indices)
+
+def cartesian_rows(umi, waypoints, spacing, tolerance=0.0):
+    ''' Computes joint rows that move the gripper in straight lines between waypoints. The lines
+        are sampled at a fixed spacing, and the inverse kinematics of all samples is computed in
+        one call. All samples use the same elbow branch, so the arm does not flip on the way.
+        The arm stops at every row, so samples are left out where the movement between the
+        remaining rows stays close enough to the line, see thin_rows.
+        :param umi: UMI_parameters object
+        :param waypoints: Array with shape (N, 4) of (x, y, z, gripper).
+        :param spacing: Largest distance in meters between two samples.
+        :param tolerance: Largest distance in meters between the gripper and the line.
+        :return: Tuple (joints, indices) with an array with shape (M, 5) of joint rows and the
+            index of every waypoint in it, or None if no elbow branch reaches all samples.
+    '''
+    (samples, indices) = sample_lines(waypoints, spacing)
+    for branch in (ELBOW_UP, ELBOW_DOWN):
+        (joints, reachable) = inverse_kinematics(umi, samples[:, :3], samples[:, 3], branch)
+        if np.all(reachable):
+            return thin_rows(umi, joints, samples, indices, tolerance)
+    return None
+
+def thin_rows(umi, joints, samples, indices, tolerance):
+    ''' Leaves out joint rows of a sampled line as long as the linear movement (in joint space)
+        between the remaining rows passes all samples within the tolerance, like the
+        Douglas-Peucker simplification of a polyline. The rows of the waypoints are kept.
+        :param umi: UMI_parameters object
+        :param joints: Array with shape (M, 5) with the joint rows of the samples.
+        :param samples: Array with shape (M, 4) with the samples (x, y, z, gripper).
+        :param indices: The index of every waypoint in samples.
+        :param tolerance: Largest distance in meters between the gripper and a sample.
+        :return: Tuple (joints, indices) with the remaining rows and the new waypoint indices.
+    '''
+    keep = set(int(i) for i in indices)
+    parts = [(int(first), int(last)) for (first, last) in zip(indices[:-1], indices[1:])]
+    while parts:
+        (first, last) = parts.pop()
+        if last - first < 2:
+            continue
+        # The samples of a part are equally spaced, so they belong to equal steps in between.
+        inner = np.arange(first + 1, last)
+        fractions = ((inner - first) / (last - first))[:, np.newaxis]
+        rows = joints[first] + fractions * (joints[last] - joints[first])
+        errors = np.linalg.norm(forward_kinematics(umi, rows) - samples[inner, :3], axis=1)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            middle = int(inner[worst])
+            keep.add(middle)
+            parts += [(first, middle), (middle, last)]
+    kept = sorted(keep)
+    position = dict((index, i) for (i, index) in enumerate(kept))
+    return (joints[kept], np.array([position[int(i)] for i in indices]))
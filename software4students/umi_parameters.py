@@ -6,37 +6,54 @@ class UMI_parameters:
     def __init__(self):
         # Specifications of UMI
         # Zed
-        self.hpedestal = 0 # ???? in meters
-        self.pedestal_offset = 0 # ???? in meters
+        self.hpedestal = 1.082 # in meters
+        self.pedestal_offset = 0.0675 # in meters
         self.wpedestal = 0.1 # just leave it 0.1
 
         # Dimensions upper arm
-        self.upper_length = 0 # ???? in meters
-        self.upper_height = 0 # ???? in meters
+        self.upper_length = 0.2535 # in meters
+        self.upper_height = 0.095 # in meters
 
         # Dimensions lower arm
-        self.lower_length = 0 # ???? in meters
-        self.lower_height = 0 # ???? in meters
+        self.lower_length = 0.2535 # in meters
+        self.lower_height = 0.080 # in meters
 
         # Dimensions wrist
-        self.wrist_height = 0 # ???? in meters
+        self.wrist_height = 0.09 # in meters
 
         # Height of the arm from the very top of the riser, to the tip of the gripper.
         self.total_arm_height = self.pedestal_offset + self.upper_height \
                                 + self.lower_height + self.wrist_height
 
         # Joint-ranges in meters (where applicable e.g. Riser, Gripper) and in degrees for the rest.
-
-        ## TODO for students: REPLACE MINIMUM_DEGREES AND MAXIMUM_DEGREES FOR EACH INDIVIDUAL JOINT, THEY ARE NOT THE SAME FOR
-        # SHOULDER, ELBOW, AND WRIST
         self.joint_ranges = {
-            "Riser"     : [0.0, maximum_height_change_this],
-            "Shoulder"  : [mimimum_degrees_change_this, maximum_degrees_change_this],
-            "Elbow"     : [mimimum_degrees_change_this, maximum_degrees_change_this],
-            "Wrist"     : [mimimum_degrees_change_this, maximum_degrees_change_this],
+            "Riser"     : [0.0, 0.925],
+            "Shoulder"  : [-90.0, 90.0],
+            "Elbow"     : [-180.0, 110.0],
+            "Wrist"     : [-110.0, 110.0],
             "Gripper"   : [0, 0.05]
         }
 
+        # The order of the joints in a row of a joint sequence.
+        self.joint_names = ["Riser", "Shoulder", "Elbow", "Wrist", "Gripper"]
+
+        # Maximum velocity (per second) and acceleration (per second squared) of the joints, in
+        # meters for the Riser and Gripper and in degrees for the rest. Used to time trajectories.
+        self.joint_velocities = {
+            "Riser"     : 0.25,
+            "Shoulder"  : 90.0,
+            "Elbow"     : 120.0,
+            "Wrist"     : 180.0,
+            "Gripper"   : 0.1
+        }
+        self.joint_accelerations = {
+            "Riser"     : 0.5,
+            "Shoulder"  : 180.0,
+            "Elbow"     : 240.0,
+            "Wrist"     : 360.0,
+            "Gripper"   : 0.2
+        }
+
     def correct_height(self, y):
         '''
             Function that corrects the y value of the umi-rtx, because the real arm runs from
@@ -0,0 +1,67 @@
+#!python2
+
+from __future__ import division, print_function
+from collections import OrderedDict
+
+from umi_board_geometry import get_pose, parameters_key
+
+class Path_cache:
+    '''
+        Remembers the most recently computed paths, such as those of high_path and move_to_garbage.
+        A path only depends on the pose of the board, the parameters of UMI, the two locations and
+        the kind of piece that is carried, so it is stored under (from, to, piece). All paths are
+        dropped when the pose of the board or a parameter of UMI changes.
+    '''
+    def __init__(self, size=1024):
+        self.size = size
+        self.paths = OrderedDict()
+        # The pose of the board and the parameters of UMI of the stored paths.
+        self.context = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def path(self, chessboard, umi, from_pos, to_pos, compute):
+        '''
+            Gives the path from the cache, or computes and stores it.
+            :param chessboard: Chessboard object
+            :param umi: UMI_parameters object
+            :param from_pos: [a1-h8]
+            :param to_pos: [a1-h8], or a location next to the board.
+            :param compute: Function (chessboard, from_pos, to_pos) that computes the path.
+            :return: A copy of the list of instructions, so the caller may change it.
+        '''
+        context = (get_pose(chessboard), parameters_key(umi))
+        if context != self.context:
+            if self.paths:
+                self.invalidations += 1
+            self.clear()
+            self.context = context
+        if from_pos in chessboard.pieces:
+            piece = chessboard.pieces[from_pos][1]
+            key = (from_pos, to_pos, piece, chessboard.pieces_height[piece])
+        else:
+            key = (from_pos, to_pos, None, None)
+
+        if key in self.paths:
+            self.hits += 1
+            sequence_list = self.paths.pop(key)
+        else:
+            self.misses += 1
+            sequence_list = [list(line) for line in compute(chessboard, from_pos, to_pos)]
+            if len(self.paths) >= self.size:
+                self.paths.popitem(last=False)
+        self.paths[key] = sequence_list
+        return [list(line) for line in sequence_list]
+
+    def clear(self):
+        ''' Drops all stored paths.
+        '''
+        self.paths.clear()
+        self.context = None
+
+    def statistics(self):
+        ''' Gives the number of hits, misses and invalidations, and the number of stored paths.
+        '''
+        return {"hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations, "size": len(self.paths)}
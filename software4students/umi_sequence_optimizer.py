@@ -0,0 +1,83 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+from umi_board_geometry import SAFE_HEIGHT, LOW_HEIGHT
+from umi_collision import is_collision_free
+from umi_trajectory import is_gui_command, validate_trajectory, weighted_travel
+
+def fixed_rows(chessboard, sequence_list, umi):
+    '''
+        Finds the joint rows of a sequence that the optimizer keeps: the first and the last row,
+        the rows where a GUI instruction is given, and the rows below the safe height above the
+        fields of those instructions, so the gripper still moves straight up and down there.
+        :param chessboard: Chessboard object
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :return: Set of indices in sequence_list.
+    '''
+    joint_indices = [i for (i, line) in enumerate(sequence_list) if not is_gui_command(line)]
+    fixed = set(joint_indices[:1] + joint_indices[-1:])
+    event_angles = []
+    previous = None
+    for (i, line) in enumerate(sequence_list):
+        if is_gui_command(line):
+            if previous != None:
+                fixed.add(previous)
+                event_angles.append(np.array(sequence_list[previous][1:4], dtype=float))
+        else:
+            previous = i
+    safe_riser = chessboard.get_board_height() + SAFE_HEIGHT + umi.total_arm_height
+    for i in joint_indices:
+        line = sequence_list[i]
+        if line[0] < safe_riser - 1e-9 and \
+                any(np.allclose(line[1:4], angles) for angles in event_angles):
+            fixed.add(i)
+    return fixed
+
+def candidate_sequences(chessboard, sequence_list, umi):
+    '''
+        Gives all sequences that differ from the given one by one change: a joint row that is
+        not fixed is removed, or a row at the safe height is lowered to the low height.
+    '''
+    fixed = fixed_rows(chessboard, sequence_list, umi)
+    safe_riser = chessboard.get_board_height() + SAFE_HEIGHT + umi.total_arm_height
+    for (i, line) in enumerate(sequence_list):
+        if is_gui_command(line) or i in fixed:
+            continue
+        yield sequence_list[:i] + sequence_list[i + 1:]
+        if abs(line[0] - safe_riser) < 1e-9:
+            lowered = [line[0] - (SAFE_HEIGHT - LOW_HEIGHT)] + list(line[1:])
+            yield sequence_list[:i] + [lowered] + sequence_list[i + 1:]
+
+def optimize_sequence(chessboard, sequence_list, umi, clearance=0.005, steps=20):
+    '''
+        Shortens a sequence, such as the combination of move_to_garbage and the path of the
+        capturing piece, by leaving out returns to the safe height where the collision checker
+        allows it. In every round all sequences with one row removed or lowered are compared,
+        and the one with the least weighted joint travel that is collision free and within the
+        joint ranges is taken, until no change reduces the travel any further.
+        :param chessboard: Chessboard object with the pieces at the start of the sequence.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :param clearance: Distance in meters that is kept from all pieces.
+        :param steps: Number of samples per movement for the collision checker.
+        :return: The optimized list of joint rows and GUI instructions.
+    '''
+    current = [list(line) for line in sequence_list]
+    cost = weighted_travel(current, umi)
+    while True:
+        candidates = []
+        for candidate in candidate_sequences(chessboard, current, umi):
+            candidate_cost = weighted_travel(candidate, umi)
+            if candidate_cost < cost - 1e-9:
+                candidates.append((candidate_cost, candidate))
+        candidates.sort(key=lambda item: item[0])
+        for (candidate_cost, candidate) in candidates:
+            if validate_trajectory(candidate, umi) == None and \
+                    is_collision_free(chessboard, candidate, umi, steps, clearance):
+                (cost, current) = (candidate_cost, candidate)
+                break
+        else:
+            return current
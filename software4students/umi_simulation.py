@@ -10,6 +10,8 @@ from copy import deepcopy
 from umi_parameters import UMI_parameters
 from umi_chessboard import UMI_chessboard
 from umi_student_functions import *
+from umi_kinematics import forward_kinematics
+from umi_trajectory import segment_durations, move_duration, interpolate_rows
 import numpy as np
 import os.path
 
@@ -18,6 +20,11 @@ import os.path
 
 # Specifications of UMI ARE IMPORTED THROUGH umi_student_functions.
 
+# Updates of the scene per second while the arm moves.
+FRAME_RATE = 100
+# Updates of the sliders and labels per second while the arm moves.
+WIDGET_RATE = 10
+
 #**********************************************
 # Functions that are called on various events
 
@@ -110,7 +117,12 @@ def store_input_text(evt):
     joints_file = "joints_simulator.txt"
     input_text = input_field.GetValue()
     if len(input_text) == 4:
-        parameter_lines = move(CHESSBOARD, input_text[0:2], input_text[2:4])
+        try:
+            parameter_lines = move(CHESSBOARD, input_text[0:2], input_text[2:4])
+        except ValueError as e:
+            # The arm can not make this move, the joint files are left as they are.
+            print(e)
+            return
         write_parameters_to_file(parameter_lines, joints_file)
 
 L = 600
@@ -259,30 +271,25 @@ def get_gripper_bottom_position():
     Gives the position of the tip of the gripper in the real world coordinate system.
     :return: Tuple in the format (x,y,z)
     '''
-    return frame0.frame_to_world(
-        riser.frame_to_world(
-            shoulder_joint.frame_to_world(
-                elbow_joint.frame_to_world(
-                    wrist_joint.pos + vector(0,-UMI.wrist_height, 0)
-                )
-            )
-        )
-    )
+    return vector(tuple(forward_kinematics(UMI, to_joint_degrees(UMI_angles))[0]))
 
 def execute_sequence(sequence_list):
     '''
     Runs the commands as provided in a list
     :param sequence_list: List where each row contains either a GUI command or a joints-setting for the arm.
     '''
-    # First move up so you do not knock over anything.
-    safe_angles = deepcopy(UMI_angles)
+    # First move up so you do not knock over anything (the rows of the sequence are in degrees).
+    current_angles = to_joint_degrees(UMI_angles).tolist()
+    safe_angles = deepcopy(current_angles)
     safe_angles[0] = CHESSBOARD.get_board_height() + 0.2 + UMI.total_arm_height
     # Set to a safe location before execution
     loop_angles = deepcopy(UMI_angles)
     # Then continue with the original plans.
     total_list = [safe_angles] + sequence_list
+    # Time every movement by the joint velocity and acceleration limits.
+    durations = segment_durations(total_list, UMI, current_angles)
     chess_piece = None
-    for new_angles in total_list:
+    for (new_angles, duration) in zip(total_list, durations):
         if len(new_angles) == 3 and new_angles[0] == "GUI":
             [_, command, piece_position] = new_angles
             if command == "TAKE" and chess_piece == None:
@@ -316,29 +323,68 @@ def execute_sequence(sequence_list):
             # Degrees to Radians.
             new_angles = [new_angles[0]] + [radians(x) for x in new_angles[1:-1]] + [new_angles[-1]]
             # Correct the height
-            animate_arm(loop_angles, new_angles)
+            animate_arm(loop_angles, new_angles, duration)
             loop_angles = deepcopy(UMI_angles)
-            sleep(0.5)
 
-def animate_arm(from_angles, to_angles):
+def animate_arm(from_angles, to_angles, duration=None):
     '''
     Given two different joint combinations, animate the movement for the arm between those two.
+    All frames are computed before the animation starts. The scene is updated FRAME_RATE times
+    per second, the sliders and labels only WIDGET_RATE times per second.
     :param from_angles: Original joint positions.
     :param to_angles: New joint positions.
+    :param duration: Time the movement takes in seconds. By default the time the joint with the
+        largest change needs, so small movements take only a few frames.
+    '''
+    old_a = np.array(from_angles, dtype=float)
+    new_a = np.array(to_angles, dtype=float)
+    if duration == None:
+        duration = move_duration(UMI, to_joint_degrees(old_a), to_joint_degrees(new_a))
+    steps = max(1, int(np.ceil(duration * FRAME_RATE)))
+    frames = interpolate_rows([old_a, new_a], steps)[1:]
+    # Everything the scene needs for every frame.
+    riser_heights = UMI.correct_height(frames[:, 0])
+    (cosines, sines) = (np.cos(frames[:, 1:4]), np.sin(frames[:, 1:4]))
+    centers = forward_kinematics(UMI, to_joint_degrees(frames))
+    (gripper_y, gripper_width) = (gripper_pos.pos.y, gripper_pos.width)
+    widget_interval = max(1, int(round(FRAME_RATE / WIDGET_RATE)))
+    for i in range(steps):
+        rate(FRAME_RATE)
+        riser.pos.y = riser_heights[i]
+        shoulder_joint.axis = (cosines[i, 0], 0, sines[i, 0])
+        elbow_joint.axis = (cosines[i, 1], 0, sines[i, 1])
+        wrist_joint.axis = (cosines[i, 2], 0, sines[i, 2])
+        gripper_pos.pos = (0, gripper_y, 0.5*gripper_width+frames[i, 4]/2)
+        gripper_neg.pos = (0, gripper_y, -0.5*gripper_width-frames[i, 4]/2)
+        UMI_angles[:] = frames[i].tolist()
+        disp.center = vector(tuple(centers[i]))
+        if i % widget_interval == 0 or i == steps - 1:
+            update_widgets()
+
+def update_widgets():
+    '''
+    Shows the current joint values (UMI_angles) on the sliders and labels.
+    '''
+    (riser_height, shoulder, elbow, wrist, gripper) = UMI_angles
+    s0_label.SetLabel('Set Riser Height: %d mm' % (riser_height * 1000.0))
+    s0.SetValue(riser_height * 1000.0)
+    s1_label.SetLabel('Set Shoulder rotation: %.2f degrees' % degrees(shoulder))
+    s1.SetValue(shoulder*1000.0)
+    s2_label.SetLabel('Set Elbow rotation: %.2f degrees' % degrees(elbow))
+    s2.SetValue(elbow*1000.0)
+    s3_label.SetLabel('Set Wrist rotation: %.2f degrees' % degrees(wrist))
+    s3.SetValue(wrist*1000.0)
+    s4_label.SetLabel('Set Gripper opening: %d mm' % (gripper * 1000))
+    s4.SetValue(gripper*1000.0)
+
+def to_joint_degrees(joints):
+    '''
+    Converts joint rows with angles in radians (like UMI_angles) to rows with angles in degrees.
+    :param joints: Array with shape (5,) or (N, 5).
     '''
-    # Compute the differences for all joints
-    old_a = np.array(from_angles)
-    new_a = np.array(to_angles)
-    delta_a = ( new_a - old_a )
-    # Move through these differences in 100 steps
-    for i in np.arange(0.0, 1.01, 0.01):
-        rate(100)
-        moveRiser(old_a[0] + delta_a[0]*i)
-        moveShoulder(old_a[1] + delta_a[1]*i)
-        moveElbow(old_a[2] + delta_a[2]*i)
-        moveWrist(old_a[3] + delta_a[3]*i)
-        moveGripper(old_a[4] + delta_a[4]*i)
-        disp.center=get_gripper_bottom_position()
+    joints = np.array(joints, dtype=float)
+    joints[..., 1:4] = np.degrees(joints[..., 1:4])
+    return joints
 
 def move(chessboard, from_pos, to_pos):
     '''
@@ -348,11 +394,7 @@ def move(chessboard, from_pos, to_pos):
     :param to_pos: [a1-h8]
     :return: List of actions for the simulator to run.
     '''
-    sequence_list = []
-    # Check if you are removing a piece from play by performing the action.
-    if to_pos in chessboard.pieces:
-        sequence_list += move_to_garbage(chessboard, to_pos)
-    sequence_list += high_path(chessboard, from_pos, to_pos)
+    sequence_list = plan_move(chessboard, from_pos, to_pos)
     # Write the output files.
     write_parameters_to_file(sequence_list, "joints_simulator.txt")
     write_parameters_to_umi_robot(sequence_list)
@@ -5,11 +5,25 @@ from umi_parameters import UMI_parameters
 from umi_common import *
 import math
 import numpy as np
-from visual import *
+from umi_kinematics import inverse_kinematics, cartesian_rows
+from umi_board_geometry import *
+from umi_distance_matrix import Distance_matrix, Reachability_table
+from umi_trajectory import is_gui_command, simplify_sequence, validate_trajectory, segment_durations, move_duration
+from umi_sequence_optimizer import optimize_sequence
+from umi_path_cache import Path_cache
+from umi_collision import is_collision_free
 # Specifications of UMI
 # Enter the correct details in the corresponding file (umi_parameters.py).
 # <<<<<<<<<<-------------------------------------------------------------------- TODO FOR STUDENTS
 UMI = UMI_parameters()
+# The most recently computed high paths.
+PATH_CACHE = Path_cache()
+# The most recently computed straight line paths, one cache for every travel height.
+CARTESIAN_CACHES = {}
+# Largest distance in meters between two samples of a straight line path.
+CARTESIAN_SPACING = 0.01
+# Largest distance in meters between the gripper and the straight line.
+CARTESIAN_TOLERANCE = 0.002
 
 def apply_inverse_kinematics(x, y, z, gripper):
     ''' Computes the angles, given some real world coordinates
@@ -22,17 +36,10 @@ def apply_inverse_kinematics(x, y, z, gripper):
     # Implementation is based on the Robotics readers made by Leo.
     # TIP: If you want to know at all times, what the current x,y,z of your robot-arm is,
     # Read the other TIP at the bottom of the umi_simulation file.
-    
-    # Real arm runs from of 0 to 1.082
-    riser_position = y + UMI.total_arm_height # (we want the gripper to be at the y position, but we can only influence the riser.)
-
-    # Compute the resulting angles for each joint in DEGREES (you can use the degrees() function to convert radians).
-    elbow_angle = 0 # ????
-    shoulder_angle = 0 # ????
-    # We want the piece to be placed down in the same angle as we picked it up
-    wrist_angle = 0 # ????
-    # Gripper is not influenced by the kinematics, so one less variable for you to alter *yay*
-    return (riser_position, shoulder_angle, elbow_angle, wrist_angle, gripper)
+
+    # The computation itself is done by the batch version, for a single target.
+    (joints, reachable) = inverse_kinematics(UMI, [(x, y, z)], gripper)
+    return tuple(joints[0].tolist())
 
 def board_position_to_cartesian(chessboard, position):
     ''' Convert a position between [a1-h8] to its cartesian coordinates in frameworld coordinates.
@@ -49,14 +56,73 @@ def board_position_to_cartesian(chessboard, position):
     (row, column) = to_coordinate(position)
 
     # h8 is closes to the rotation point, row a[1-8] is furthest away from the robot arm.
+    # The center of the field in the frame of the board.
+    local_x = chessboard.field_size * (7 - row) + chessboard.field_size / 2.0
+    local_z = chessboard.field_size * (7 - column) + chessboard.field_size / 2.0
 
-    # ????? Perform the calculations, also take a rotation and translation of the chessboard in account!
+    # Rotate around the corner next to h8, and translate to the position of that corner.
+    angle = chessboard.get_angle_radians()
+    (board_x, board_y, board_z) = chessboard.get_position()
+    world_coordinate_x = board_x + local_x * math.cos(angle) - local_z * math.sin(angle)
+    world_coordinate_y = board_y
+    world_coordinate_z = board_z + local_x * math.sin(angle) + local_z * math.cos(angle)
 
     # Output the results.
     result = (world_coordinate_x, world_coordinate_y, world_coordinate_z)
 
     return result
 
+def plan_move(chessboard, from_pos, to_pos, cartesian=False):
+    '''
+    Given two positions on the board [a1-h8] compute the required actions. A piece on to_pos is
+    moved to the garbage location first. The piece is carried over empty fields when possible.
+    :param chessboard: Chessboard object
+    :param from_pos: [a1-h8]
+    :param to_pos: [a1-h8]
+    :param cartesian: Carry the piece in a straight line (see cartesian_path), on LOW height if
+        that does not hit a piece, else on SAFE height. The other paths are used when the arm
+        can not follow the straight line, or when it is faster on them.
+    :return: List of actions for the simulator to run.
+    :raises ValueError: If a joint row of the sequence is not within the joint ranges.
+    '''
+    sequence_list = []
+    # Check if you are removing a piece from play by performing the action.
+    if to_pos in chessboard.pieces:
+        sequence_list += move_to_garbage(chessboard, to_pos)
+    path = None
+    if Reachability_table.for_board(chessboard).is_reachable(from_pos, to_pos):
+        path = low_path(chessboard, from_pos, to_pos)
+        # The arm may not be able to reach a field on the way, and the movements between the
+        # corners bow towards the neighbouring fields, where a tall piece may be hit.
+        if validate_trajectory(path, UMI) != None or not is_collision_free(chessboard, path, UMI):
+            path = None
+    if path == None:
+        path = high_path(chessboard, from_pos, to_pos)
+    if sequence_list:
+        # Combine removing the captured piece with the move itself.
+        path = optimize_sequence(chessboard, sequence_list + path, UMI)
+    # Remove the waypoints that do not change the motion.
+    path = simplify_sequence(path, UMI)
+    if cartesian:
+        # A capture starts with the captured piece.
+        start_pos = to_pos if sequence_list else from_pos
+        for height in (LOW_HEIGHT, SAFE_HEIGHT):
+            candidate = cartesian_path(chessboard, from_pos, to_pos, height)
+            if candidate and is_collision_free(chessboard, candidate, UMI):
+                # Leaving out rows would bend the straight lines again, so it is not optimized.
+                candidate = simplify_sequence(sequence_list + candidate, UMI)
+                # The arm stops at every row of the straight lines, which may take longer.
+                if path_duration(chessboard, candidate, start_pos, to_pos) <= \
+                        path_duration(chessboard, path, start_pos, to_pos):
+                    path = candidate
+                break
+    sequence_list = path
+    # Never give the robot joint values it can not reach.
+    problem = validate_trajectory(sequence_list, UMI)
+    if problem != None:
+        raise ValueError("Move %s%s is not possible, row %d: %s" % ((from_pos, to_pos) + problem))
+    return sequence_list
+
 def high_path(chessboard, from_pos, to_pos):
     '''
     Computes the high path that the arm can take to move a piece from one place on the board to another.
@@ -65,47 +131,147 @@ def high_path(chessboard, from_pos, to_pos):
     :param to_pos: [a1-h8]
     :return: Returns a list of instructions for the GUI.
     '''
-    sequence_list = []
-    # We assume that 20 centimeter above the board is safe.
-    safe_height = 0.2
-    # We assume that 10 centimeter above the board is "low".
-    low_height = 0.1
-
-    # Define half_piece height (you want to grab the middle of a piece, so get the height of the piece on a position.)
-    # (*cough* this data might be stored in a chessboard *cough*)
-    # You might need if statements around this, but you have to fill this variable regardlessly.
-    half_piece_height = 0 # ????
-
-    # Get the coordinates.
-    (from_x, from_y, from_z) = board_position_to_cartesian(chessboard, from_pos)
-    (to_x, to_y, to_z) = board_position_to_cartesian(chessboard, to_pos)
-
-    REPLACE_THIS_WITH_YOUR_OWN_CODE = "wrong"
-    # Hover above the first field on SAFE height:
-    sequence_list.append(apply_inverse_kinematics(from_x, REPLACE_THIS_WITH_YOUR_OWN_CODE, from_z, chessboard.field_size))
-    # Hover above the first field on LOW height:
-
-    # Hover above the first field on half of the piece height:
+    # The path only depends on the pose, the fields and the piece, so it is reused when possible.
+    return PATH_CACHE.path(chessboard, UMI, from_pos, to_pos, pick_and_place)
 
-    # Hover above the first field on half of the piece height:
-
-    # Grip the piece
-
-    # Give instruction to GUI to pickup piece
-    sequence_list.append(["GUI", "TAKE", from_pos])
-    # Hover above the first field on SAFE height (Keep the gripper closed!!):
-
-    # Move to new position on SAFE height
-
-    # Hover above the first field on LOW height:
+def low_path(chessboard, from_pos, to_pos):
+    '''
+    Computes the low path that the arm can take to move a piece from one place on the board to another:
+    the piece is carried at LOW height over empty fields only, following the distance transform from
+    from_pos down to to_pos. Straight parts of the path are joined into a single movement. If there is
+    no such path, the high path is returned.
+    :param chessboard: Chessboard object
+    :param from_pos: [a1-h8]
+    :param to_pos: [a1-h8]
+    :return: Returns a list of instructions for the GUI.
+    '''
+    # The field of the piece itself becomes empty once it is picked up.
+    distance_matrix = Distance_matrix()
+    distance_matrix.distance_transform(chessboard, to_pos)
+    distance_matrix.update(vacated=[from_pos])
+    if distance_matrix.not_possible(from_pos):
+        return high_path(chessboard, from_pos, to_pos)
+
+    # Descend the distance transform, keeping only the fields where the direction changes.
+    corners = []
+    position = to_coordinate(from_pos)
+    direction = None
+    while distance_matrix.distance_matrix[position[0]][position[1]] > 0:
+        (neighbour, value) = distance_matrix.smallest_positive_neighbour(position[0], position[1])
+        new_direction = (neighbour[0] - position[0], neighbour[1] - position[1])
+        if direction is not None and new_direction != direction:
+            corners.append(to_notation(position))
+        direction = new_direction
+        position = neighbour
+
+    table = get_pose_table(chessboard)
+    if from_pos in chessboard.pieces:
+        piece = chessboard.pieces[from_pos][1]
+    else:
+        piece = None
+    opened = chessboard.field_size
+    closed = 0
+
+    sequence_list = [
+        # Hover above the first field on LOW height:
+        table.joints(from_pos, "low", opened),
+        # Hover above the first field on half of the piece height:
+        table.joints(from_pos, piece, opened),
+        # Grip the piece
+        table.joints(from_pos, piece, closed),
+        # Give instruction to GUI to pickup piece
+        ["GUI", "TAKE", from_pos],
+        # Hover above the first field on LOW height (Keep the gripper closed!!):
+        table.joints(from_pos, "low", closed),
+    ]
+    # Follow the path on LOW height
+    for corner in corners:
+        sequence_list.append(table.joints(corner, "low", closed))
+    sequence_list += [
+        # Hover above the new field on LOW height:
+        table.joints(to_pos, "low", closed),
+        # Hover above the new field on half of the piece height:
+        table.joints(to_pos, piece, closed),
+        # Release the piece
+        table.joints(to_pos, piece, opened),
+        # Give instruction to GUI to drop piece
+        ["GUI", "DROP", to_pos],
+        # Move up to LOW height (And open the gripper)
+        table.joints(to_pos, "low", opened),
+    ]
+    return sequence_list
 
-    # Hover above the first field on half of the piece height:
+def cartesian_path(chessboard, from_pos, to_pos, height=LOW_HEIGHT):
+    '''
+    Computes the path that carries a piece in straight lines: up and down above the fields, and
+    straight from one field to the other at the given height. Moving linearly in joint space
+    makes the gripper follow a curve, so the lines are sampled every CARTESIAN_SPACING meters,
+    and the joint values of all samples are computed with a single inverse kinematics call. The
+    arm stops at every row, so only the rows needed to stay within CARTESIAN_TOLERANCE of the
+    lines are kept.
+    :param chessboard: Chessboard object
+    :param from_pos: [a1-h8]
+    :param to_pos: [a1-h8], or a location next to the board such as the garbage location.
+    :param height: Height above the board at which the piece is carried.
+    :return: Returns a list of instructions for the GUI, or an empty list if the arm can not
+        follow the lines.
+    '''
+    if height not in CARTESIAN_CACHES:
+        CARTESIAN_CACHES[height] = Path_cache()
+    compute = lambda board, start, end: straight_line_path(board, start, end, height)
+    return CARTESIAN_CACHES[height].path(chessboard, UMI, from_pos, to_pos, compute)
 
-    # Give instruction to GUI to drop piece
-    sequence_list.append(["GUI", "DROP", to_pos])
-    # Move to new position on SAFE height (And open the gripper)
+def path_duration(chessboard, path, from_pos, to_pos):
+    '''
+    Computes how long the arm takes for a path, from SAFE height above from_pos until it is back
+    at SAFE height above to_pos, so paths that start or end at another height can be compared.
+    :param chessboard: Chessboard object
+    :param path: List with joint rows and GUI instructions, as given by plan_move.
+    :param from_pos: [a1-h8], the field above which the path starts.
+    :param to_pos: [a1-h8], or a location next to the board such as the garbage location.
+    :return: Duration in seconds.
+    '''
+    table = get_pose_table(chessboard)
+    start = table.joints(from_pos, "safe", chessboard.field_size)
+    end = table.joints(to_pos, "safe", chessboard.field_size)
+    rows = [line for line in path if not is_gui_command(line)]
+    return sum(segment_durations(path, UMI, start)) + move_duration(UMI, rows[-1], end)
 
-    return sequence_list
+def straight_line_path(chessboard, from_pos, to_pos, height):
+    '''
+    Computes the path of cartesian_path, without the cache.
+    '''
+    table = get_pose_table(chessboard)
+    if from_pos in chessboard.pieces:
+        piece = chessboard.pieces[from_pos][1]
+    else:
+        piece = None
+    opened = chessboard.field_size
+    closed = 0
+    start = np.array(table.cartesian(from_pos))
+    end = np.array(table.cartesian(to_pos))
+    (up, grip) = (np.array([0, height, 0]), np.array([0, table.heights[piece], 0]))
+
+    # Positions (x, y, z) and gripper widths the gripper moves through in straight lines.
+    waypoints = np.array([
+        np.append(start + up, opened),
+        np.append(start + grip, opened),
+        np.append(start + grip, closed),
+        np.append(start + up, closed),
+        np.append(end + up, closed),
+        np.append(end + grip, closed),
+        np.append(end + grip, opened),
+        np.append(end + up, opened),
+    ])
+    rows = cartesian_rows(UMI, waypoints, CARTESIAN_SPACING, CARTESIAN_TOLERANCE)
+    if rows == None:
+        return []
+    (joints, indices) = rows
+    joints = joints.tolist()
+    # The piece is taken after the gripper closed (waypoint 2), and dropped after it opened (6).
+    (take, drop) = (indices[2] + 1, indices[6] + 1)
+    return joints[:take] + [["GUI", "TAKE", from_pos]] + joints[take:drop] + \
+        [["GUI", "DROP", to_pos]] + joints[drop:]
 
 def move_to_garbage(chessboard, from_pos):
     '''
@@ -114,45 +280,65 @@ def move_to_garbage(chessboard, from_pos):
         :param from_pos: [a1-h8]
         :return: Returns a list of instructions for the GUI.
     '''
-    sequence_list = []
-    # We assume that 20 centimeter above the board is safe.
-    safe_height = 0.2
-    # We assume that 10 centimeter above the board is "low".
-    low_height = 0.1
-    drop_location = "j5"
-    # Define half_piece height (you want to grab the middle of a piece, so get the height of the piece on a position.)
-    # (*cough* this data might be stored in a chessboard *cough*)
-    REPLACE_THIS_WITH_YOUR_OWN_CODE = "wrong"
-    # You might need if statements around this, but you have to fill this variable regardlessly.
-    half_piece_height = 0 # ????
-
-    # Get the coordinates.
-    (from_x, from_y, from_z) = board_position_to_cartesian(chessboard, from_pos)
-    (to_x, to_y, to_z) = board_position_to_cartesian(chessboard, drop_location)
-
-
-    # Hover above the first field on SAFE height:
-    sequence_list.append(apply_inverse_kinematics(from_x, REPLACE_THIS_WITH_YOUR_OWN_CODE, from_z, chessboard.field_size))
-    # Hover above the first field on LOW height:
-
-    # Hover above the first field on half of the piece height:
-
-    # Hover above the first field on half of the piece height:
+    drop_location = GARBAGE_LOCATION
+    return PATH_CACHE.path(chessboard, UMI, from_pos, drop_location, pick_and_place)
 
-    # Grip the piece
-
-    # Give instruction to GUI to pickup piece
-    sequence_list.append(["GUI", "TAKE", from_pos])
-    # Hover above the first field on SAFE height (Keep the gripper closed!!):
-
-    # Move to new position on SAFE height
-
-    # Hover above the first field on LOW height:
-
-    # Hover above the first field on half of the piece height:
-
-    # Give instruction to GUI to drop piece
-    sequence_list.append(["GUI", "DROP", drop_location])
-    # Move to new position on SAFE height (And open the gripper)
+def get_pose_table(chessboard):
+    '''
+        Gives the precomputed fields and joint values for the current pose of the board. The
+        table is stored on the chessboard, and computed again when the pose has changed.
+        :param chessboard: Chessboard object
+        :return: Pose_table object
+    '''
+    table = getattr(chessboard, "pose_table", None)
+    if table is None or not table.is_valid_for(chessboard):
+        table = Pose_table(chessboard, UMI)
+        chessboard.pose_table = table
+    return table
 
+def pick_and_place(chessboard, from_pos, to_pos):
+    '''
+    Computes the high path that picks up the piece on from_pos and puts it down on to_pos. All
+    positions of the arm are looked up in the pose table of the board.
+    :param chessboard: Chessboard object
+    :param from_pos: [a1-h8]
+    :param to_pos: [a1-h8], or a location next to the board such as the garbage location.
+    :return: Returns a list of instructions for the GUI.
+    '''
+    table = get_pose_table(chessboard)
+
+    # Grab the piece in the middle (the table stores half the height of each kind of piece).
+    if from_pos in chessboard.pieces:
+        piece = chessboard.pieces[from_pos][1]
+    else:
+        piece = None
+
+    opened = chessboard.field_size
+    closed = 0
+    sequence_list = [
+        # Hover above the first field on SAFE height:
+        table.joints(from_pos, "safe", opened),
+        # Hover above the first field on LOW height:
+        table.joints(from_pos, "low", opened),
+        # Hover above the first field on half of the piece height:
+        table.joints(from_pos, piece, opened),
+        # Grip the piece
+        table.joints(from_pos, piece, closed),
+        # Give instruction to GUI to pickup piece
+        ["GUI", "TAKE", from_pos],
+        # Hover above the first field on SAFE height (Keep the gripper closed!!):
+        table.joints(from_pos, "safe", closed),
+        # Move to new position on SAFE height
+        table.joints(to_pos, "safe", closed),
+        # Hover above the new field on LOW height:
+        table.joints(to_pos, "low", closed),
+        # Hover above the new field on half of the piece height:
+        table.joints(to_pos, piece, closed),
+        # Release the piece
+        table.joints(to_pos, piece, opened),
+        # Give instruction to GUI to drop piece
+        ["GUI", "DROP", to_pos],
+        # Move to new position on SAFE height (And open the gripper)
+        table.joints(to_pos, "safe", opened),
+    ]
     return sequence_list
@@ -0,0 +1,172 @@
+#!python2
+
+from __future__ import division, print_function
+import numpy as np
+
+from umi_kinematics import joint_limits
+
+def is_gui_command(line):
+    ''' Checks whether a line of a sequence is an instruction for the GUI (e.g. ["GUI", "TAKE", "a1"]).
+    '''
+    return len(line) == 3 and line[0] == "GUI"
+
+def joint_scale(umi):
+    ''' Gives the size of the range of every joint, used to compare joints with different units.
+        :param umi: UMI_parameters object
+        :return: Array with shape (5,).
+    '''
+    return np.array([umi.joint_ranges[name][1] - umi.joint_ranges[name][0] for name in umi.joint_names],
+                    dtype=float)
+
+def simplify_sequence(sequence_list, umi, tolerance=1e-6):
+    '''
+        Removes the waypoints that do not change the motion of the arm: waypoints equal to the
+        previous waypoint, and waypoints that lie on the straight line (in joint space) between
+        their neighbours, like the extra stops of a vertical movement. The arm interpolates
+        linearly between waypoints, so it follows the same path. Waypoints directly before and
+        after a GUI instruction are kept, so the arm is at the same place when a piece is taken
+        or dropped.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :param tolerance: Relative tolerance (of the joint ranges) for equal and collinear waypoints.
+        :return: The simplified list of joint rows and GUI instructions.
+    '''
+    scale = joint_scale(umi)
+    result = []
+    # Index in result of the first joint row after the last GUI instruction.
+    run_start = 0
+    previous = None
+    for line in sequence_list:
+        if is_gui_command(line):
+            result.append(line)
+            run_start = len(result)
+            continue
+        row = np.array(line, dtype=float) / scale
+        if previous is not None and np.all(np.abs(row - previous) <= tolerance):
+            continue
+        # Drop the previous row if it is on the line between the row before it and this row.
+        if len(result) - run_start >= 2:
+            before = np.array(result[-2], dtype=float) / scale
+            if is_on_segment(before, previous, row, tolerance):
+                result.pop()
+        result.append(list(line))
+        previous = row
+    return result
+
+def is_on_segment(start, middle, end, tolerance):
+    ''' Checks whether middle lies on the straight line segment from start to end.
+    '''
+    first = middle - start
+    second = end - middle
+    length = np.linalg.norm(first) * np.linalg.norm(second)
+    # Same direction: the angle between both parts is (nearly) zero.
+    return np.dot(first, second) >= length * (1.0 - tolerance)
+
+def weighted_travel(sequence_list, umi):
+    '''
+        Computes the total travel of all joints in a sequence, every joint weighted by the
+        inverse of its velocity, so the travel of the riser (meters) and the other joints
+        (degrees) can be added. It is the time the arm needs when every joint moves on its own
+        at its maximum velocity.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :return: Weighted travel in seconds.
+    '''
+    rows = np.array([line for line in sequence_list if not is_gui_command(line)], dtype=float).reshape(-1, 5)
+    velocity = np.array([umi.joint_velocities[name] for name in umi.joint_names], dtype=float)
+    return float(np.sum(np.abs(np.diff(rows, axis=0)) / velocity))
+
+def move_duration(umi, from_row, to_row):
+    '''
+        Computes the time the arm needs to move between two joint rows, when every joint moves
+        with a trapezoidal velocity profile within its velocity and acceleration limits. The
+        slowest joint determines the duration.
+        :param umi: UMI_parameters object
+        :param from_row: List with the riser, shoulder, elbow, wrist and gripper values.
+        :param to_row: List with the riser, shoulder, elbow, wrist and gripper values.
+        :return: Duration in seconds.
+    '''
+    velocity = np.array([umi.joint_velocities[name] for name in umi.joint_names], dtype=float)
+    acceleration = np.array([umi.joint_accelerations[name] for name in umi.joint_names], dtype=float)
+    distance = np.abs(np.array(to_row, dtype=float) - np.array(from_row, dtype=float))
+    # Joints that do not reach their maximum velocity accelerate half of the way.
+    durations = np.where(distance > velocity**2 / acceleration,
+                         distance / velocity + velocity / acceleration,
+                         2.0 * np.sqrt(distance / acceleration))
+    return float(np.max(durations))
+
+def segment_durations(sequence_list, umi, start_row):
+    '''
+        Computes for every line of a sequence how long the arm takes to get there from the
+        previous joint row. GUI instructions take no time.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :param start_row: The joint row the arm starts from.
+        :return: List with a duration in seconds for every line of the sequence.
+    '''
+    durations = []
+    previous = start_row
+    for line in sequence_list:
+        if is_gui_command(line):
+            durations.append(0.0)
+        else:
+            durations.append(move_duration(umi, previous, line))
+            previous = line
+    return durations
+
+def interpolate_rows(rows, steps):
+    ''' Interpolates linearly between consecutive joint rows, like animate_arm.
+        :param rows: List of N joint rows.
+        :param steps: Number of steps between two rows.
+        :return: Array with shape ((N - 1) * steps + 1, 5).
+    '''
+    rows = np.asarray(rows, dtype=float)
+    if steps <= 1 or len(rows) < 2:
+        return rows
+    fractions = np.arange(steps) / steps
+    start = rows[:-1, np.newaxis, :]
+    delta = (rows[1:] - rows[:-1])[:, np.newaxis, :]
+    path = (start + fractions[np.newaxis, :, np.newaxis] * delta).reshape(-1, rows.shape[1])
+    return np.concatenate([path, rows[-1:]])
+
+def validate_trajectory(sequence_list, umi, time_step=None, tolerance=1e-9):
+    '''
+        Checks all joint rows of a sequence at once against the joint ranges of UMI, and, for
+        trajectories sampled at a fixed time step, against the joint velocities.
+        :param sequence_list: List with joint rows and GUI instructions.
+        :param umi: UMI_parameters object
+        :param time_step: Time in seconds between two joint rows. By default the velocities are
+            not checked, as the waypoints of a planned sequence are timed by segment_durations.
+        :param tolerance: Values this much outside of a range are still accepted.
+        :return: None if the trajectory is valid, otherwise a tuple (index in sequence_list of
+            the first row that is not, description of the cause).
+    '''
+    indices = [i for (i, line) in enumerate(sequence_list) if not is_gui_command(line)]
+    if not indices:
+        return None
+    rows = np.array([sequence_list[i] for i in indices], dtype=float).reshape(-1, 5)
+    (minimum, maximum) = joint_limits(umi)
+    invalid = np.isnan(rows) | (rows < minimum - tolerance) | (rows > maximum + tolerance)
+    if time_step != None:
+        velocity = np.array([umi.joint_velocities[name] for name in umi.joint_names], dtype=float)
+        speed = np.abs(np.diff(rows, axis=0)) / time_step
+        too_fast = np.vstack([np.zeros((1, 5), dtype=bool), speed > velocity * (1.0 + tolerance)])
+    else:
+        too_fast = np.zeros(rows.shape, dtype=bool)
+
+    wrong = np.nonzero(np.any(invalid | too_fast, axis=1))[0]
+    if len(wrong) == 0:
+        return None
+    row = wrong[0]
+    if np.any(invalid[row]):
+        joint = np.nonzero(invalid[row])[0][0]
+        name = umi.joint_names[joint]
+        if np.isnan(rows[row, joint]):
+            cause = "%s is not reachable" % name
+        else:
+            cause = "%s out of range: %g not in [%g, %g]" % (name, rows[row, joint], minimum[joint], maximum[joint])
+    else:
+        joint = np.nonzero(too_fast[row])[0][0]
+        cause = "%s too fast: %g per second, the maximum is %g" % \
+            (umi.joint_names[joint], speed[row - 1, joint], velocity[joint])
+    return (indices[row], cause)